@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark for reading resource field values.
+
+Compares the generic timestamp parser with the fast path for the format
+written by Varda, and repeated field access with and without the converted
+value cache.
+
+Usage::
+
+    python benchmarks/fields.py
+"""
+
+
+from __future__ import print_function
+
+import timeit
+
+import dateutil.parser
+
+from manwe import fields, resources
+
+
+TIMESTAMP = '2015-10-07T14:21:03.123456'
+
+SAMPLE = {'uri': '/samples/3',
+          'name': 'test sample',
+          'pool_size': 5,
+          'coverage_profile': True,
+          'public': False,
+          'user': {'uri': '/users/8'},
+          'active': True,
+          'notes': 'Some test notes',
+          'added': TIMESTAMP}
+
+NUMBER = 100000
+
+
+def report(name, seconds):
+    print('%-36s %8.3f us per call' % (name, seconds / NUMBER * 1e6))
+
+
+def main():
+    field = fields.DateTime()
+    report('dateutil.parser.parse',
+           timeit.timeit(lambda: dateutil.parser.parse(TIMESTAMP),
+                         number=NUMBER))
+    report('DateTime.to_python',
+           timeit.timeit(lambda: field.to_python(TIMESTAMP, None),
+                         number=NUMBER))
+
+    sample = resources.Sample(None, SAMPLE)
+    added = next(f for f in resources.Sample._fields if f.name == 'added')
+    report('Sample.added (uncached conversion)',
+           timeit.timeit(lambda: added.to_python(TIMESTAMP, sample),
+                         number=NUMBER))
+    report('Sample.added (cached)',
+           timeit.timeit(lambda: sample.added, number=NUMBER))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for the JSON codecs on Varda payloads.
+
+Encodes and decodes a page of variants, a page of samples with embedded
+users, and a variant annotation request with every JSON library that is
+installed.
+
+Usage::
+
+    python benchmarks/json_codecs.py
+"""
+
+
+from __future__ import print_function
+
+import timeit
+
+from manwe.codec import CODECS, get_codec
+
+
+VARIANTS = {'variant_collection': {'items': [
+    {'uri': '/variants/%d' % i,
+     'chromosome': str(i % 22 + 1),
+     'position': 10000 + i * 17,
+     'reference': 'A' * (i % 3),
+     'observed': 'GT' * (i % 2)}
+    for i in range(1000)]}}
+
+SAMPLES = {'sample_collection': {'items': [
+    {'uri': '/samples/%d' % i,
+     'name': u'test sample %d (Manwë)' % i,
+     'pool_size': 5,
+     'coverage_profile': True,
+     'public': False,
+     'user': {'uri': '/users/8',
+              'name': 'Test user',
+              'login': 'test',
+              'email': 'test@example.com',
+              'roles': ['importer', 'annotator'],
+              'added': '2015-10-07T14:21:03.123456'},
+     'groups': [{'uri': '/groups/%d' % g} for g in range(i % 3)],
+     'active': True,
+     'notes': 'Some test notes',
+     'added': '2015-10-07T14:21:03.123456'}
+    for i in range(1000)]}}
+
+ANNOTATION = {'queries': [{'name': 'Q%d' % i,
+                           'expression': 'sample: /samples/%d' % i}
+                          for i in range(50)]}
+
+NUMBER = 20
+
+
+def main():
+    payloads = [('variants', VARIANTS),
+                ('samples', SAMPLES),
+                ('annotation', ANNOTATION)]
+
+    for name in CODECS:
+        try:
+            codec = get_codec(name)
+        except ImportError:
+            print('%-12s not installed' % name)
+            continue
+        for payload_name, payload in payloads:
+            encoded = codec.dumps(payload)
+            dumps = timeit.timeit(lambda: codec.dumps(payload),
+                                  number=NUMBER) / NUMBER
+            loads = timeit.timeit(lambda: codec.loads(encoded),
+                                  number=NUMBER) / NUMBER
+            print('%-12s %-12s dumps %8.3f ms  loads %8.3f ms' % (
+                name, payload_name, dumps * 1e3, loads * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark for loading resource pages.
+
+Creates resource instances for a page of variant representations as returned
+by the API, which is what happens for every page of a collection.
+
+Usage::
+
+    python benchmarks/loading.py
+"""
+
+
+from __future__ import print_function
+
+import timeit
+
+from manwe import resources
+
+
+PAGE = [{'uri': '/variants/%d' % i,
+         'chromosome': '1',
+         'position': 10000 + i,
+         'reference': 'A',
+         'observed': 'G'}
+        for i in range(1000)]
+
+NUMBER = 100
+
+
+def main():
+    seconds = timeit.timeit(
+        lambda: [resources.Variant(None, values) for values in PAGE],
+        number=NUMBER)
+    print('%-36s %8.3f ms per page of %d' % (
+        'Variant (load values)', seconds / NUMBER * 1e3, len(PAGE)))
+
+    variant = resources.Variant(None, PAGE[0])
+    seconds = timeit.timeit(
+        lambda: variant._load_values(PAGE[1], skip_dirty=True),
+        number=NUMBER * 1000)
+    print('%-36s %8.3f us per call' % (
+        'Variant._load_values (refresh)', seconds / NUMBER * 1e3))
+
+
+if __name__ == '__main__':
+    main()
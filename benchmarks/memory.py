@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Memory benchmark for resource instances.
+
+Reports the number of bytes per :class:`manwe.resources.Variant` and
+:class:`manwe.resources.Sample` instance, both as the size of the instance
+with its containers and as the growth of the process resident set size.
+
+Usage::
+
+    python benchmarks/memory.py [NUMBER]
+"""
+
+
+from __future__ import print_function
+
+import gc
+import resource
+import sys
+
+from manwe import resources
+
+
+def variant(i):
+    return {'uri': '/variants/%d' % i,
+            'chromosome': '1',
+            'position': 1000 + i,
+            'reference': 'A',
+            'observed': 'T'}
+
+
+def sample(i):
+    return {'uri': '/samples/%d' % i,
+            'name': 'sample %d' % i,
+            'pool_size': 1,
+            'coverage_profile': True,
+            'public': False,
+            'user': {'uri': '/users/1'},
+            'groups': [{'uri': '/groups/1'}],
+            'active': True,
+            'notes': None,
+            'added': '2015-10-07T14:21:03.123456'}
+
+
+def container_size(instance):
+    """
+    Size of a resource instance and the containers it owns (not the field
+    values, which are shared with the API representation).
+    """
+    size = sys.getsizeof(instance)
+    for name in ('__dict__', '_values', '_python_values', '_dirty'):
+        value = getattr(instance, name, None)
+        if value is not None:
+            size += sys.getsizeof(value)
+    return size
+
+
+def max_rss():
+    # On Linux, this is in kilobytes.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def measure(resource_class, values, number):
+    representations = [values(i) for i in range(number)]
+    gc.collect()
+    before = max_rss()
+    instances = [resource_class(None, r) for r in representations]
+    gc.collect()
+    after = max_rss()
+    print('%-8s %6d bytes per instance (containers), '
+          '%6d bytes per instance (resident set growth)'
+          % (resource_class.__name__, container_size(instances[0]),
+             (after - before) // number))
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    measure(resources.Variant, variant, number)
+    measure(resources.Sample, sample, number)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark for the startup time of the command line interface.
+
+Measures the time it takes a new Python process to import the command line
+interface and create its configuration (everything that happens before
+argument parsing), and reports which of the slow to import dependencies
+were imported.
+
+For comparison, the same is measured while also importing the dependencies
+that were imported on startup before they were deferred (Flask for the
+configuration, clint, dateutil, werkzeug, and requests-toolbelt).
+
+Usage::
+
+    python benchmarks/startup.py [PATH]
+
+where `PATH` is the source tree to import Manwë from (default is the tree
+containing this script). To compare with a version before the startup
+improvements, run it on a checkout of that version::
+
+    git worktree add /tmp/manwe-old <commit>
+    python benchmarks/startup.py /tmp/manwe-old
+"""
+
+
+from __future__ import print_function
+
+import os
+import subprocess
+import sys
+import time
+
+
+SCRIPT = """
+import sys
+%s
+import manwe.commands
+manwe.commands.create_config()
+print(' '.join(sorted(
+    name for name in %r if name in sys.modules)))
+"""
+
+MODULES = ('clint', 'dateutil', 'flask', 'requests', 'requests_toolbelt',
+           'werkzeug')
+
+# Modules that were imported on startup before they were deferred.
+EAGER_IMPORTS = """
+import clint.textui
+import dateutil.parser
+import flask.config
+import requests_toolbelt.multipart.encoder
+import werkzeug.datastructures
+import werkzeug.http
+"""
+
+NUMBER = 20
+
+
+def measure(args, path):
+    """
+    Average time in seconds to run `args` in a new process with `path` as
+    the working directory, and the output of the last run.
+    """
+    started = time.time()
+    for _ in range(NUMBER):
+        output = subprocess.check_output(args, cwd=path)
+    return (time.time() - started) / NUMBER, output.decode('utf-8').strip()
+
+
+def main():
+    if len(sys.argv) > 1:
+        path = os.path.abspath(sys.argv[1])
+    else:
+        path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    # Baseline: starting the interpreter without importing anything.
+    baseline, _ = measure([sys.executable, '-c', 'pass'], path)
+    elapsed, imported = measure(
+        [sys.executable, '-c', SCRIPT % ('', MODULES)], path)
+    eager, _ = measure(
+        [sys.executable, '-c', SCRIPT % (EAGER_IMPORTS, MODULES)], path)
+
+    print('%-36s %8.1f ms' % ('python -c pass', baseline * 1e3))
+    print('%-36s %8.1f ms' % ('import manwe.commands', elapsed * 1e3))
+    print('%-36s %8.1f ms' % ('... with eager imports', eager * 1e3))
+    print('%-36s %s' % ('Imported dependencies', imported or '-'))
+
+
+if __name__ == '__main__':
+    main()
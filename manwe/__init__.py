@@ -9,7 +9,7 @@ database for genomic variation frequencies.
 """
 
 
-from .session import Session
+from .session import AsyncSession, Session
 
 
 # We follow a versioning scheme compatible with setuptools [1] where the
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Manwë columnar export of resource collections.
+
+Resource representations are written page by page into typed NumPy arrays,
+without instantiating :class:`resources.Resource` objects. Use this via
+:meth:`resources.ResourceCollection.to_arrays`.
+
+This module requires `NumPy <http://www.numpy.org/>`_, which is an optional
+dependency of Manwë.
+
+.. moduleauthor:: Martijn Vermaat <martijn@vermaat.name>
+
+.. Licensed under the MIT license, see the LICENSE file.
+"""
+
+
+import collections
+
+import numpy
+
+from .fields import Boolean, DateTime, Integer, Link, String
+
+
+#: Column of strings as a tuple of an array of offsets and an array of bytes.
+#: String `i` is encoded (UTF-8) in `data[offsets[i]:offsets[i + 1]]`.
+StringArray = collections.namedtuple('StringArray', ['offsets', 'data'])
+
+#: Column of strings as a tuple of an array of integer codes and an array of
+#: distinct values. Value `i` is `categories[codes[i]]`, or missing if
+#: `codes[i]` is `-1`.
+CategoricalArray = collections.namedtuple('CategoricalArray',
+                                          ['codes', 'categories'])
+
+
+class Buffer(object):
+    """
+    Growable one-dimensional array.
+    """
+    def __init__(self, dtype, capacity=1024):
+        self._array = numpy.empty(capacity, dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def extend(self, values):
+        """
+        Append a sequence of values.
+        """
+        size = self._size + len(values)
+        if size > len(self._array):
+            array = numpy.empty(max(size, 2 * len(self._array)),
+                                dtype=self._array.dtype)
+            array[:self._size] = self._array[:self._size]
+            self._array = array
+        self._array[self._size:size] = values
+        self._size = size
+
+    def result(self):
+        """
+        Array of all appended values.
+        """
+        return self._array[:self._size].copy()
+
+
+class Column(object):
+    """
+    Base class for writing the values of a field into an array.
+    """
+    def __init__(self, field):
+        self.field = field
+
+    def extend(self, items):
+        """
+        Append the field values for a page of resource representations.
+        """
+        raise NotImplementedError()
+
+    def result(self):
+        """
+        Array of all appended field values.
+        """
+        raise NotImplementedError()
+
+
+class NumberColumn(Column):
+    """
+    Column of integer or boolean values.
+    """
+    def __init__(self, field, dtype):
+        super(NumberColumn, self).__init__(field)
+        self._buffer = Buffer(dtype)
+
+    def extend(self, items):
+        values = [item.get(self.field.key) for item in items]
+        if None in values:
+            raise ValueError('Cannot export missing values for field: %s'
+                             % self.field.name)
+        self._buffer.extend(values)
+
+    def result(self):
+        return self._buffer.result()
+
+
+class DateTimeColumn(Column):
+    """
+    Column of timestamps with microsecond precision (missing values are
+    `NaT`).
+    """
+    def __init__(self, field):
+        super(DateTimeColumn, self).__init__(field)
+        self._buffer = Buffer('datetime64[us]')
+
+    def extend(self, items):
+        values = []
+        for item in items:
+            value = self.field.to_python(item.get(self.field.key), None)
+            values.append(numpy.datetime64('NaT') if value is None
+                          else numpy.datetime64(value, 'us'))
+        self._buffer.extend(values)
+
+    def result(self):
+        return self._buffer.result()
+
+
+class StringColumn(Column):
+    """
+    Column of strings stored as a :class:`StringArray` (missing values are
+    empty strings). Links are stored by their URIs.
+    """
+    def __init__(self, field):
+        super(StringColumn, self).__init__(field)
+        self._offsets = Buffer('int64')
+        self._offsets.extend([0])
+        self._data = Buffer('uint8')
+
+    def extend(self, items):
+        strings = [_encode(_string(self.field, item.get(self.field.key)))
+                   for item in items]
+        offset = len(self._data)
+        offsets = []
+        for string in strings:
+            offset += len(string)
+            offsets.append(offset)
+        self._offsets.extend(offsets)
+        data = b''.join(strings)
+        if data:
+            self._data.extend(numpy.frombuffer(data, dtype='uint8'))
+
+    def result(self):
+        return StringArray(self._offsets.result(), self._data.result())
+
+
+class CategoricalColumn(Column):
+    """
+    Column of strings stored as a :class:`CategoricalArray`. Links are stored
+    by their URIs.
+    """
+    def __init__(self, field):
+        super(CategoricalColumn, self).__init__(field)
+        self._codes = Buffer('int32')
+        self._categories = {}
+
+    def extend(self, items):
+        codes = []
+        for item in items:
+            value = _string(self.field, item.get(self.field.key))
+            if value is None:
+                codes.append(-1)
+            else:
+                codes.append(self._categories.setdefault(
+                    value, len(self._categories)))
+        self._codes.extend(codes)
+
+    def result(self):
+        categories = sorted(self._categories, key=self._categories.get)
+        return CategoricalArray(self._codes.result(),
+                                numpy.array(categories, dtype=object))
+
+
+def _string(field, value):
+    """
+    String value for a string or link field.
+    """
+    if isinstance(field, Link) and isinstance(value, dict):
+        return value['uri']
+    return value
+
+
+def _encode(value):
+    if value is None:
+        return b''
+    return value.encode('utf-8')
+
+
+def create_column(field, categorical=False):
+    """
+    Create a column for the values of a field.
+
+    :arg field: Field definition.
+    :type field: :class:`fields.Field`
+    :arg bool categorical: If `True`, store string values as a
+      :class:`CategoricalArray`.
+
+    :raises ValueError: If the field type cannot be exported.
+    """
+    if isinstance(field, (String, Link)):
+        if categorical:
+            return CategoricalColumn(field)
+        return StringColumn(field)
+    if categorical:
+        raise ValueError('Cannot export field as categorical: %s'
+                         % field.name)
+    if isinstance(field, Boolean):
+        return NumberColumn(field, 'bool')
+    if isinstance(field, Integer):
+        return NumberColumn(field, 'int64')
+    if isinstance(field, DateTime):
+        return DateTimeColumn(field)
+    raise ValueError('Cannot export field: %s' % field.name)
+
+
+def exportable(field):
+    """
+    Return `True` if values of `field` can be exported to an array.
+    """
+    return isinstance(field, (Boolean, DateTime, Integer, Link, String))
@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+"""
+Manwë caches.
+
+.. moduleauthor:: Martijn Vermaat <martijn@vermaat.name>
+
+.. Licensed under the MIT license, see the LICENSE file.
+"""
+
+
+import collections
+import errno
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class ResourceCache(object):
+    """
+    Mapping of keys to values with a least recently used (LRU) eviction
+    policy and optional expiration of values.
+
+    Expired values are not removed from the cache, they are reported as such
+    by :meth:`get`. This allows the caller to refresh a value in place
+    instead of replacing it.
+
+    The cache is safe to use from multiple threads.
+    """
+    def __init__(self, size, ttl=None):
+        """
+        Create a cache.
+
+        :arg int size: Maximum number of values to keep. If `0`, nothing is
+          cached.
+        :arg ttl: Number of seconds after which values expire. If `None`,
+          values never expire.
+        :type ttl: float
+        """
+        self.size = size
+        self.ttl = ttl
+        # Values are stored as (value, timestamp) tuples.
+        self._values = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def get(self, key):
+        """
+        Get a value from the cache.
+
+        :return: Tuple of the value and a boolean which is `True` if the value
+          has expired.
+
+        :raises KeyError: If the cache does not contain `key`.
+        """
+        with self._lock:
+            value, timestamp = self._values.pop(key)
+            self._values[key] = value, timestamp
+        expired = self.ttl is not None and time.time() - timestamp > self.ttl
+        return value, expired
+
+    def set(self, key, value):
+        """
+        Store a value in the cache, or renew it if it is already stored.
+        """
+        if not self.size:
+            return
+        with self._lock:
+            self._values.pop(key, None)
+            self._values[key] = value, time.time()
+            while len(self._values) > self.size:
+                self._values.popitem(last=False)
+
+    def remove(self, key):
+        """
+        Remove a value from the cache (if present).
+        """
+        with self._lock:
+            self._values.pop(key, None)
+
+    def clear(self):
+        """
+        Remove all values from the cache.
+        """
+        with self._lock:
+            self._values.clear()
+
+
+#: Response as stored in a :class:`ResponseCache`, with a dictionary of
+#: response headers and the response body as a byte string.
+CachedResponse = collections.namedtuple(
+    'CachedResponse', ['url', 'status_code', 'headers', 'content'])
+
+
+class ResponseCache(object):
+    """
+    In-memory cache of HTTP responses with a least recently used (LRU)
+    eviction policy based on the total size of the response bodies.
+
+    The cache is safe to use from multiple threads.
+    """
+    def __init__(self, size):
+        """
+        Create a response cache.
+
+        :arg int size: Maximum total size of the cached response bodies (in
+          bytes).
+        """
+        self.size = size
+        # Sizes of the cached responses by name, in LRU order.
+        self._sizes = collections.OrderedDict()
+        self._bytes = 0
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sizes)
+
+    @property
+    def bytes(self):
+        """
+        Total size of the cached response bodies (in bytes).
+        """
+        return self._bytes
+
+    def get(self, key):
+        """
+        Get a response from the cache.
+
+        :arg str key: Key for the request.
+
+        :return: The cached response, or `None` if there is no response
+          for `key`.
+        :rtype: :class:`CachedResponse`
+        """
+        name = self._name(key)
+        with self._lock:
+            if name not in self._sizes:
+                return None
+            self._sizes[name] = self._sizes.pop(name)
+            try:
+                return self._read(name)
+            except (IOError, OSError, ValueError):
+                # Corrupt or removed entry.
+                self._remove(name)
+                return None
+
+    def set(self, key, response):
+        """
+        Store a response in the cache, evicting least recently used
+        responses if needed. Responses larger than the cache are not stored.
+
+        :arg str key: Key for the request.
+        :arg response: The response to store.
+        :type response: :class:`CachedResponse`
+        """
+        name = self._name(key)
+        size = len(response.content)
+        with self._lock:
+            self._remove(name)
+            if size > self.size:
+                return
+            size = self._write(name, response)
+            self._sizes[name] = size
+            self._bytes += size
+            while self._bytes > self.size:
+                self._remove(next(iter(self._sizes)))
+
+    def remove(self, key):
+        """
+        Remove a response from the cache (if present).
+        """
+        with self._lock:
+            self._remove(self._name(key))
+
+    def clear(self):
+        """
+        Remove all responses from the cache.
+        """
+        with self._lock:
+            for name in list(self._sizes):
+                self._remove(name)
+
+    def _remove(self, name):
+        if name in self._sizes:
+            self._bytes -= self._sizes.pop(name)
+            self._delete(name)
+
+    def _name(self, key):
+        return key
+
+    def _read(self, name):
+        return self._responses[name]
+
+    def _write(self, name, response):
+        """
+        Store a response and return its size in bytes.
+        """
+        self._responses[name] = response
+        return len(response.content)
+
+    def _delete(self, name):
+        del self._responses[name]
+
+
+class DiskResponseCache(ResponseCache):
+    """
+    On-disk cache of HTTP responses with a least recently used (LRU)
+    eviction policy based on the total size of the response bodies.
+
+    Every response is stored in a separate file named by a hash of its key,
+    so the cache can be reused by later sessions. The size of a response
+    includes its headers here. It is not safe to use the same directory from
+    multiple processes at the same time.
+    """
+    def __init__(self, path, size):
+        """
+        Create a response cache.
+
+        :arg str path: Directory to store the responses in (created if it
+          does not exist).
+        :arg int size: Maximum total size of the cached response bodies (in
+          bytes).
+        """
+        super(DiskResponseCache, self).__init__(size)
+        self.path = path
+
+        try:
+            os.makedirs(path)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+        # Restore LRU order from file modification times.
+        entries = []
+        for name in os.listdir(path):
+            if not name.endswith('.response'):
+                continue
+            stat = os.stat(os.path.join(path, name))
+            entries.append((stat.st_mtime, name[:-len('.response')],
+                            stat.st_size))
+        for _, name, size in sorted(entries):
+            self._sizes[name] = size
+            self._bytes += size
+        with self._lock:
+            while self._bytes > self.size:
+                self._remove(next(iter(self._sizes)))
+
+    def _filename(self, name):
+        return os.path.join(self.path, name + '.response')
+
+    def _name(self, key):
+        if not isinstance(key, bytes):
+            key = key.encode('utf-8')
+        return hashlib.sha1(key).hexdigest()
+
+    def _read(self, name):
+        # The file starts with a line of JSON metadata, followed by the
+        # response body.
+        filename = self._filename(name)
+        with open(filename, 'rb') as handle:
+            metadata = json.loads(handle.readline().decode('utf-8'))
+            content = handle.read()
+        os.utime(filename, None)
+        return CachedResponse(metadata['url'], metadata['status_code'],
+                              metadata['headers'], content)
+
+    def _write(self, name, response):
+        metadata = json.dumps({'url': response.url,
+                               'status_code': response.status_code,
+                               'headers': response.headers})
+        handle, temporary = tempfile.mkstemp(dir=self.path)
+        with os.fdopen(handle, 'wb') as handle:
+            handle.write(metadata.encode('utf-8') + b'\n')
+            handle.write(response.content)
+            size = handle.tell()
+        os.rename(temporary, self._filename(name))
+        return size
+
+    def _delete(self, name):
+        try:
+            os.remove(self._filename(name))
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+
+class EndpointCache(object):
+    """
+    API endpoint URIs stored in a JSON file, so they can be reused by later
+    sessions.
+    """
+    def __init__(self, path, ttl=None):
+        """
+        Create an endpoint cache.
+
+        :arg str path: File to store the endpoints in (its directory is
+          created if it does not exist).
+        :arg ttl: Number of seconds after which stored endpoints expire. If
+          `None`, endpoints never expire.
+        :type ttl: float
+        """
+        self.path = path
+        self.ttl = ttl
+
+    def _read(self):
+        try:
+            with open(self.path) as handle:
+                return json.load(handle)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def get(self, key):
+        """
+        Get endpoints from the cache.
+
+        :arg str key: Key for the API (e.g., its root URI).
+
+        :return: Dictionary mapping API endpoints to their URIs, or `None` if
+          there are no endpoints for `key` or they have expired.
+        """
+        entry = self._read().get(key)
+        if entry is None:
+            return None
+        if self.ttl is not None and time.time() - entry['time'] > self.ttl:
+            return None
+        return entry['endpoints']
+
+    def set(self, key, endpoints):
+        """
+        Store endpoints in the cache.
+
+        :arg str key: Key for the API (e.g., its root URI).
+        :arg dict endpoints: Dictionary mapping API endpoints to their URIs.
+
+        :raises EnvironmentError: If the cache file could not be written.
+        """
+        entries = self._read()
+        entries[key] = {'endpoints': endpoints, 'time': time.time()}
+        self._write(entries)
+
+    def remove(self, key):
+        """
+        Remove endpoints from the cache (if present).
+
+        :raises EnvironmentError: If the cache file could not be written.
+        """
+        entries = self._read()
+        if entries.pop(key, None) is not None:
+            self._write(entries)
+
+    def _write(self, entries):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        # Write to a temporary file first, so concurrent readers never see
+        # a partially written file.
+        handle, temporary = tempfile.mkstemp(dir=directory)
+        with os.fdopen(handle, 'w') as handle:
+            json.dump(entries, handle)
+        os.rename(temporary, self.path)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Manwë JSON codecs.
+
+Request and response bodies are encoded and decoded by the session codec,
+which can use a faster JSON library than the Python standard library if one
+is installed.
+
+.. moduleauthor:: Martijn Vermaat <martijn@vermaat.name>
+
+.. Licensed under the MIT license, see the LICENSE file.
+"""
+
+
+import importlib
+import json
+
+
+#: Names of supported JSON libraries, in order of preference.
+CODECS = ('ujson', 'simplejson', 'json')
+
+
+class Codec(object):
+    """
+    JSON encoder and decoder.
+    """
+    def __init__(self, name, dumps, loads, decoder=None):
+        """
+        Create a codec.
+
+        :arg str name: Name of the codec.
+        :arg dumps: Function serializing a Python value to JSON.
+        :arg loads: Function deserializing JSON to a Python value.
+        :arg decoder: Decoder used to decode values from a partial JSON
+          document (must implement `raw_decode`). By default, a standard
+          library `json.JSONDecoder` is used.
+        """
+        #: Name of the codec.
+        self.name = name
+
+        #: Function serializing a Python value to JSON.
+        self.dumps = dumps
+
+        #: Function deserializing JSON to a Python value.
+        self.loads = loads
+
+        #: Decoder used to decode values from a partial JSON document (see
+        #: :mod:`manwe.stream`).
+        self.decoder = decoder or json.JSONDecoder()
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, self.name)
+
+
+def get_codec(name='auto'):
+    """
+    Create a codec for a JSON library.
+
+    :arg str name: Name of the JSON library (one of :data:`CODECS`), or
+      `auto` to use the first one that is installed.
+
+    :return: A codec for the JSON library.
+    :rtype: :class:`Codec`
+
+    :raises ValueError: If `name` is not a supported JSON library.
+    :raises ImportError: If the JSON library is not installed.
+    """
+    if name == 'auto':
+        for candidate in CODECS[:-1]:
+            try:
+                return get_codec(candidate)
+            except ImportError:
+                pass
+        return get_codec(CODECS[-1])
+
+    if name not in CODECS:
+        raise ValueError('Unknown JSON codec: %s' % name)
+
+    module = importlib.import_module(name)
+    if hasattr(module, 'JSONDecoder'):
+        decoder = module.JSONDecoder()
+    else:
+        decoder = None
+    return Codec(name, module.dumps, module.loads, decoder=decoder)
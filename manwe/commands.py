@@ -12,17 +12,14 @@ Todo: Move some of the docstring from the _old_population_study.py file here.
 
 import argparse
 import getpass
-import itertools
 import os
 import re
 import sys
 
-from clint import textui
-
 from .config import Config
 from .errors import (ApiError, BadRequestError, UnauthorizedError,
                      ForbiddenError, NotFoundError)
-from .resources import USER_ROLES
+from .resources import TaskMonitor, USER_ROLES
 from .session import Session
 
 
@@ -31,6 +28,10 @@ USER_CONFIGURATION = os.path.join(
     os.environ.get('XDG_CONFIG_HOME', None) or
     os.path.join(os.path.expanduser('~'), '.config'),
     'manwe', 'config')
+ENDPOINT_CACHE = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', None) or
+    os.path.join(os.path.expanduser('~'), '.cache'),
+    'manwe', 'endpoints')
 
 
 class UserError(Exception):
@@ -48,12 +49,16 @@ def abort(message=None):
 
 
 def wait_for_tasks(*tasks):
+    # Importing clint is slow, so we only do it when needed.
+    from clint import textui
+
+    if not tasks:
+        return
+
+    monitor = TaskMonitor(tasks[0].resource.session, tasks)
     with textui.progress.Bar(expected_size=100) as bar:
-        for percentages in itertools.izip_longest(
-                *[task.wait_and_monitor() for task in tasks], fillvalue=100):
-            # We treat the `None` percentage (waiting) as `0` (running).
-            bar.show(sum(percentage for percentage in percentages
-                         if percentage is not None) // len(tasks))
+        for progress in monitor.wait_and_monitor():
+            bar.show(progress)
 
 
 def list_samples(session, public=False, user=None, groups=None):
@@ -87,7 +92,7 @@ def show_sample(session, uri):
     Show sample details.
     """
     try:
-        sample = session.sample(uri)
+        sample = session.sample(uri, embed=('user', 'groups'))
     except NotFoundError:
         raise UserError('Sample does not exist: "%s"' % uri)
 
@@ -213,7 +218,11 @@ def import_sample(session, name, groups=None, pool_size=1, public=False,
     sample = add_sample(session, name, groups=groups, pool_size=pool_size,
                         public=public, no_coverage_profile=no_coverage_profile)
 
-    tasks = []
+    # Imports are started via the task scheduler, which might queue them
+    # until other tasks are finished (see `MAX_RUNNING_TASKS`). Note that
+    # this only limits the imports of this sample, not those of other runs.
+    scheduler = session.task_scheduler
+    imports = []
 
     for source, filename in vcf_sources:
         data_source = session.create_data_source(
@@ -222,11 +231,9 @@ def import_sample(session, name, groups=None, pool_size=1, public=False,
             gzipped=filename.endswith('.gz'),
             **source)
         log('Added data source: %s' % data_source.uri)
-        variation = session.create_variation(
-            sample, data_source,
-            prefer_genotype_likelihoods=prefer_genotype_likelihoods)
-        log('Started variation import: %s' % variation.uri)
-        tasks.append(variation.task)
+        imports.append(('variation', scheduler.submit(
+            session.create_variation, sample, data_source,
+            prefer_genotype_likelihoods=prefer_genotype_likelihoods)))
 
     for source, filename in bed_sources:
         data_source = session.create_data_source(
@@ -235,9 +242,15 @@ def import_sample(session, name, groups=None, pool_size=1, public=False,
             gzipped=filename.endswith('.gz'),
             **source)
         log('Added data source: %s' % data_source.uri)
-        coverage = session.create_coverage(sample, data_source)
-        log('Started coverage import: %s' % coverage.uri)
-        tasks.append(coverage.task)
+        imports.append(('coverage', scheduler.submit(
+            session.create_coverage, sample, data_source)))
+
+    tasks = []
+
+    for kind, future in imports:
+        resource = future.result()
+        log('Started %s import: %s' % (kind, resource.uri))
+        tasks.append(resource.task)
 
     if not wait:
         return
@@ -421,7 +434,7 @@ def show_data_source(session, uri):
     Show data source details.
     """
     try:
-        data_source = session.data_source(uri)
+        data_source = session.data_source(uri, embed=('user',))
     except NotFoundError:
         raise UserError('Data source does not exist: "%s"' % uri)
 
@@ -547,6 +560,9 @@ def create_config(filename=None):
     If both files exist, values defined in the second overwrite values defined
     in the first.
 
+    Discovered API endpoints are stored in `ENDPOINT_CACHE`, unless the
+    configuration sets another `ENDPOINT_CACHE` value.
+
     An exception to this is when the optional `filename` argument is set. In
     that case, the locations listed above are ignored and the configuration is
     read from `filename`.
@@ -559,6 +575,7 @@ def create_config(filename=None):
     :rtype: config.Config
     """
     config = Config()
+    config.ENDPOINT_CACHE = ENDPOINT_CACHE
 
     if filename:
         config.from_pyfile(filename)
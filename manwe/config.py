@@ -9,9 +9,10 @@ Manwë configuration object.
 """
 
 
+import errno
+import importlib
 import os
-
-import flask.config
+import types
 
 from . import default_config
 
@@ -35,14 +36,104 @@ class AttributeDictMixin(object):
         self[key] = value
 
 
-class Config(flask.config.Config, AttributeDictMixin):
+class Config(dict, AttributeDictMixin):
     """
-    Dictionary with some extra ways to fill it from files or special
-    dictionaries (see `flask.config.Config`) and attribute access.
+    Dictionary with some extra ways to fill it from files or objects and
+    attribute access.
+
+    Values can be read from Python files (:meth:`from_pyfile`, and
+    :meth:`from_envvar` for a file referenced by an environment variable) and
+    from objects (:meth:`from_object`), with the same behaviour as these
+    methods on `flask.config.Config`. Other methods of `flask.config.Config`
+    are not supported. Only uppercase keys are read from files and objects.
 
     Initialized with :mod:`manwe.default_config`.
     """
     def __init__(self):
-        # We fix the root_path argument to the current working directory.
-        super(Config, self).__init__(os.getcwd())
+        super(Config, self).__init__()
+        # Relative filenames are relative to the current working directory.
+        # We bypass attribute access here, this is not a configuration value.
+        object.__setattr__(self, 'root_path', os.getcwd())
         self.from_object(default_config)
+
+    def from_envvar(self, variable_name, silent=False):
+        """
+        Update the values from the Python file referenced by an environment
+        variable (see :meth:`from_pyfile`).
+
+        :arg str variable_name: Name of the environment variable.
+        :arg bool silent: If `True`, fail silently if the environment variable
+          is not set or the file does not exist.
+
+        :return: `True` if the file was loaded, `False` otherwise.
+        :rtype: bool
+
+        :raises RuntimeError: If the environment variable is not set (and
+          `silent` is `False`).
+        """
+        filename = os.environ.get(variable_name)
+        if not filename:
+            if silent:
+                return False
+            raise RuntimeError('The environment variable %r is not set'
+                               % variable_name)
+        return self.from_pyfile(filename, silent=silent)
+
+    def from_pyfile(self, filename, silent=False):
+        """
+        Update the values from a Python file, which is executed and its
+        uppercase variables are stored in the configuration.
+
+        :arg str filename: Name of the file, absolute or relative to the
+          current working directory (at the time of creating the
+          configuration).
+        :arg bool silent: If `True`, fail silently if the file does not
+          exist.
+
+        :return: `True` if the file was loaded, `False` otherwise.
+        :rtype: bool
+        """
+        filename = os.path.join(self.root_path, filename)
+        module = types.ModuleType('config')
+        module.__file__ = filename
+        try:
+            with open(filename, 'rb') as config_file:
+                code = compile(config_file.read(), filename, 'exec')
+        except IOError as e:
+            if silent and e.errno in (errno.ENOENT, errno.EISDIR):
+                return False
+            e.strerror = 'Unable to load configuration file (%s)' % e.strerror
+            raise
+        exec(code, module.__dict__)
+        self.from_object(module)
+        return True
+
+    def from_object(self, obj):
+        """
+        Update the values from the uppercase attributes of an object (e.g., a
+        module).
+
+        :arg obj: The object, or an import path for the object (e.g.,
+          ``'manwe.default_config'``).
+        """
+        if isinstance(obj, basestring):
+            obj = import_string(obj)
+        for key in dir(obj):
+            if key.isupper():
+                self[key] = getattr(obj, key)
+
+
+def import_string(name):
+    """
+    Import a module or an object in a module by its import path.
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        if '.' not in name:
+            raise
+    module, attribute = name.rsplit('.', 1)
+    try:
+        return getattr(importlib.import_module(module), attribute)
+    except AttributeError:
+        raise ImportError('No object %s in module %s' % (attribute, module))
@@ -16,9 +16,112 @@ COLLECTION_CACHE_SIZE = 20
 #: Size of chunks to yield from data iterator in bytes.
 DATA_BUFFER_SIZE = 1024 * 1024
 
-#: Time to wait between polling task state (in seconds).
+#: Minimum time to wait between polling task state (in seconds).
 TASK_POLL_WAIT = 2
 
+#: Maximum time to wait between polling task state (in seconds). The actual
+#: time is based on the observed task progress.
+TASK_POLL_MAX_WAIT = 60
+
+#: JSON library used for request and response bodies (`json`, `simplejson`,
+#: or `ujson`), or `auto` to use the fastest one that is installed.
+JSON_CODEC = 'auto'
+
 #: Whether or not to verify the API SSL certificate, or a path to a CA_BUNDLE
 #: file with certificates of trusted CAs.
 VERIFY_CERTIFICATE = True
+
+#: Number of per-host connection pools to keep.
+HTTP_POOL_CONNECTIONS = 10
+
+#: Maximum number of keep-alive connections to keep per host.
+HTTP_POOL_MAXSIZE = 10
+
+#: Whether or not to block when all connections to a host are in use instead
+#: of opening a new (non-pooled) connection.
+HTTP_POOL_BLOCK = False
+
+#: Cache API responses for revalidation with conditional requests. Use
+#: `'memory'` for an in-memory cache, `'disk'` for an on-disk cache in
+#: `HTTP_CACHE_DIR`, or `None` to disable the cache.
+#:
+#: Only responses with an `ETag` or `Last-Modified` header are cached. The
+#: Varda server does not send these headers, so this has no effect unless
+#: the server is deployed behind a proxy adding them (and answering
+#: conditional requests).
+HTTP_CACHE = None
+
+#: Directory for the on-disk HTTP cache.
+HTTP_CACHE_DIR = None
+
+#: Maximum total size of the cached API responses (in bytes).
+HTTP_CACHE_SIZE = 64 * 1024 * 1024
+
+#: Whether or not concurrent identical `GET` requests should share a single
+#: HTTP request.
+COALESCE_REQUESTS = True
+
+#: Maximum number of API requests to run concurrently (e.g., from
+#: :class:`manwe.AsyncSession`).
+MAX_WORKERS = 10
+
+#: Maximum number of server tasks submitted via the session task scheduler
+#: that run at the same time (see :class:`manwe.resources.TaskScheduler`), or
+#: `None` for no limit.
+#:
+#: The limit applies per session. Every run of the command line interface
+#: has its own session, so for `manwe samples import` it only limits the
+#: imports of one sample. To limit the imports of many samples, submit all
+#: of them to the task scheduler of one session::
+#:
+#:     >>> scheduler = session.task_scheduler
+#:     >>> futures = [scheduler.submit(session.create_variation, sample,
+#:     ...                             data_source)
+#:     ...            for sample, data_source in imports]
+MAX_RUNNING_TASKS = None
+
+#: Maximum number of jobs running a workflow stage at the same time, by stage
+#: (see :class:`manwe.workflow.Workflow`).
+WORKFLOW_CONCURRENCY = {'upload': 2, 'variation': 4, 'annotation': 4,
+                        'download': 2}
+
+#: Maximum number of resources to keep in the session resource cache. Use `0`
+#: to disable the cache.
+RESOURCE_CACHE_SIZE = 1000
+
+#: Time after which cached resources are refreshed from the server on access
+#: (in seconds), or `None` to never refresh them automatically.
+RESOURCE_CACHE_TTL = 60
+
+#: File to store discovered API endpoints in, so they can be reused by later
+#: sessions, or `None` to discover the endpoints in every session. The
+#: command line interface uses `$XDG_CACHE_HOME/manwe/endpoints` by default.
+ENDPOINT_CACHE = None
+
+#: Time after which cached API endpoints are discovered again (in seconds),
+#: or `None` to keep using them until the server responds with `404 Not
+#: Found`.
+ENDPOINT_CACHE_TTL = 24 * 60 * 60
+
+#: Number of collection requests to run in the background ahead of iteration
+#: over the collection. Use `0` to only query when needed.
+COLLECTION_READ_AHEAD = 0
+
+#: Whether or not to adapt the number of resources to query per collection
+#: request to the observed request times, starting at `COLLECTION_CACHE_SIZE`.
+COLLECTION_ADAPTIVE = False
+
+#: Maximum number of resources to query per collection request in adaptive
+#: mode.
+COLLECTION_CACHE_SIZE_MAX = 1000
+
+#: Target time per collection request in adaptive mode (in seconds).
+COLLECTION_PAGE_TIME = 1.0
+
+#: Maximum response size per collection request in adaptive mode (in bytes).
+COLLECTION_PAGE_BYTES = 4 * 1024 * 1024
+
+#: Whether or not to decode collection responses incrementally while they are
+#: received, instead of reading complete responses first. This bounds memory
+#: use for large `COLLECTION_CACHE_SIZE` values.
+COLLECTION_STREAM = False
@@ -30,6 +30,10 @@ class NotFoundError(ApiError):
     pass
 
 
+class RequestEntityTooLargeError(ApiError):
+    pass
+
+
 class TaskError(ApiError):
     pass
 
@@ -8,7 +8,13 @@ Manwë resource fields.
 """
 
 
-import dateutil.parser
+import datetime
+import re
+
+
+# Timestamps as written by Varda (`datetime.isoformat` without timezone).
+ISO_8601_PATTERN = re.compile(
+    r'^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?$')
 
 
 class Field(object):
@@ -18,6 +24,12 @@ class Field(object):
     A field definition can convert field values from their API representation
     to their Python representation, and vice versa.
     """
+    #: If `True`, Python values converted by :meth:`to_python` are cached on
+    #: the resource until the API value changes. This should be `False` for
+    #: fields where every conversion has to produce a new value, including
+    #: fields with mutable Python values (every reader would share them).
+    cacheable = True
+
     def __init__(self, key=None, mutable=False, hidden=False, default=None,
                  doc=None):
         """
@@ -112,6 +124,9 @@ class Link(Field):
     """
     Definition for a resource link.
     """
+    # The session resource cache takes care of this.
+    cacheable = False
+
     def __init__(self, resource_key, **kwargs):
         """
         :arg str resource_key: Key for the linked resource.
@@ -123,6 +138,10 @@ class Link(Field):
         """
         Create a :class:`resources.Resource` instance from the resource URI.
 
+        The resource is not retrieved from the server until one of its field
+        values other than the URI is accessed, unless its representation was
+        embedded in the response data.
+
         Modifications of the returned resource should be saved by calling
         :meth:`resources.Resource.save` on that resource.
         """
@@ -131,11 +150,16 @@ class Link(Field):
         # This is a bit ugly. In request data, a resource link is represented
         # by its uri (a string). But in response data, it is represented by an
         # object with a uri key.
+        # If the server embedded the linked resource, the object has all its
+        # fields.
         if isinstance(value, dict):
+            if len(value) > 1:
+                return resource.session._embedded_resource(
+                    self.resource_key, value)
             uri = value['uri']
         else:
             uri = value
-        return getattr(resource.session, self.resource_key)(uri)
+        return getattr(resource.session, self.resource_key)(uri, lazy=True)
 
     def from_python(self, value):
         """
@@ -150,6 +174,16 @@ class DateTime(Field):
     def to_python(self, value, resource):
         if value is None:
             return None
+        # Parsing the format written by Varda ourselves is much faster than
+        # the generic parser.
+        match = ISO_8601_PATTERN.match(value)
+        if match:
+            year, month, day, hour, minute, second, fraction = match.groups()
+            return datetime.datetime(
+                int(year), int(month), int(day), int(hour), int(minute),
+                int(second), int(fraction.ljust(6, '0')) if fraction else 0)
+        # Importing dateutil is slow, so we only do it when needed.
+        import dateutil.parser
         return dateutil.parser.parse(value)
 
     def from_python(self, value):
@@ -159,6 +193,9 @@ class DateTime(Field):
 
 
 class Blob(Field):
+    # Every access yields a new data iterator.
+    cacheable = False
+
     def to_python(self, value, resource):
         """
         Iterator over the data source data by chunks.
@@ -181,6 +218,7 @@ class Set(Field):
         :type field: :class:`Field`
         """
         self.field = field
+        self.cacheable = field.cacheable
         super(Set, self).__init__(**kwargs)
 
     def to_python(self, value, resource):
@@ -208,6 +246,9 @@ class Queries(Field):
     As a Python value, we represent this as a dictionary with keys the query
     names and values the query expressions.
     """
+    # The dictionary is mutable, so every access yields a new copy.
+    cacheable = False
+
     def to_python(self, value, resource):
         if value is None:
             return None
@@ -223,9 +264,18 @@ class Custom(Field):
     """
     Custom field definitions are parameterized with conversion functions.
     """
-    def __init__(self, from_api, to_api, **kwargs):
+    def __init__(self, from_api, to_api, cacheable=False, **kwargs):
+        """
+        :arg from_api: Function converting an API value and the resource to a
+          Python value.
+        :arg to_api: Function converting a Python value to an API value.
+        :arg bool cacheable: If `True`, Python values are cached (see
+          :attr:`Field.cacheable`). Only use this if Python values are
+          immutable.
+        """
         self._from_api = from_api
         self._to_api = to_api
+        self.cacheable = cacheable
         super(Custom, self).__init__(**kwargs)
 
     def to_python(self, value, resource):
@@ -9,14 +9,21 @@ Manwë resources.
 
 
 import collections
+import concurrent.futures
+import heapq
+import itertools
+import logging
+import threading
 import time
 
-import werkzeug.datastructures
-import werkzeug.http
-
-from .errors import TaskError, UnsatisfiableRangeError
+from .errors import (RequestEntityTooLargeError, TaskError,
+                     UnsatisfiableRangeError)
 from .fields import (Blob, Boolean, DateTime, Custom, Field, Integer, Link,
                      Queries, Set, String)
+from .stream import iter_array
+
+
+logger = logging.getLogger('manwe')
 
 
 # This mirrors `varda.models.USER_ROLES`.
@@ -65,15 +72,22 @@ class ResourceMeta(type):
         Similar to `how Django model fields work
         <https://code.djangoproject.com/wiki/DevModelCreation>`, this sets up
         getters and setters on resource classes. The field values are stored
-        in the `_values` instance attribute.
-        """
-        fields = set()
-
-        # Inherit all fields from parent classes.
-        fields.update(*[parent._fields for parent in parents
-                        if isinstance(parent, ResourceMeta)])
-
-        for name_, attribute in attributes.items():
+        in the `_values` instance attribute, a list indexed by the position of
+        the field in the `_field_list` class attribute.
+
+        Unless the class defines `__slots__` itself, it gets empty
+        `__slots__` if all its parents have them. This keeps instances of
+        resource classes compact.
+        """
+        # Inherit all fields from parent classes, in their order. This way,
+        # inherited fields keep their position.
+        field_list = []
+        for parent in parents:
+            if isinstance(parent, ResourceMeta):
+                field_list.extend(field for field in parent._field_list
+                                  if field not in field_list)
+
+        for name_, attribute in sorted(attributes.items()):
             if not isinstance(attribute, Field):
                 continue
 
@@ -83,39 +97,127 @@ class ResourceMeta(type):
             # Store the name under which the field is available on the class
             # in the field itself.
             attribute.name = name_
-            fields.add(attribute)
 
+            # A field redefined in this class replaces the inherited field.
+            for index, field in enumerate(field_list):
+                if field.name == name_:
+                    field_list[index] = attribute
+                    break
+            else:
+                field_list.append(attribute)
+
+        for index, field in enumerate(field_list):
             # Hidden field definitions are useful for resource creation
             # arguments which are not available in the resulting resource's
             # representation.
-            if attribute.hidden:
+            if field.hidden or field.name in attributes:
                 continue
 
-            # Add field getter (and setter).
-            if attribute.mutable:
-                attributes[name_] = property(cls._getter(attribute),
-                                             cls._setter(attribute),
-                                             doc=attribute.doc)
+            # Add field getter (and setter). We also do this for inherited
+            # fields, since their position might be different in this class.
+            if field.mutable:
+                attributes[field.name] = property(cls._getter(field, index),
+                                                  cls._setter(field, index),
+                                                  doc=field.doc)
             else:
-                attributes[name_] = property(cls._getter(attribute),
-                                             doc=attribute.doc)
+                attributes[field.name] = property(cls._getter(field, index),
+                                                  doc=field.doc)
+
+        attributes['_fields'] = set(field_list)
+        attributes['_field_list'] = tuple(field_list)
+        attributes['_field_index'] = {
+            field.name: index for index, field in enumerate(field_list)}
+        attributes['_defaults'] = tuple(field.default for field in field_list)
+        attributes['_load'] = staticmethod(cls._loader(field_list))
+        attributes['_serialize'] = staticmethod(cls._serializer(field_list))
 
-        attributes['_fields'] = fields
+        if ('__slots__' not in attributes and
+            all(hasattr(parent, '__slots__') for parent in parents)):
+            attributes['__slots__'] = ()
 
         return super(ResourceMeta, cls).__new__(cls, name, parents, attributes)
 
     @staticmethod
-    def _getter(field):
+    def _loader(field_list):
+        """
+        Create a function loading API values from a dictionary (using API
+        keys) into a resource.
+
+        The mapping from API keys to field positions is computed once here,
+        so loading a resource is a single loop without allocations.
+        """
+        keys = tuple((field.key, index, field.name)
+                     for index, field in enumerate(field_list))
+
+        def load_values(resource, values, skip_dirty=False):
+            store = resource._values
+            dirty = resource._dirty
+            python_values = resource._python_values
+            if not dirty and not python_values:
+                # Common case, e.g., for a newly created resource.
+                for key, index, _ in keys:
+                    if key in values:
+                        store[index] = values[key]
+                return
+            for key, index, name in keys:
+                if key not in values:
+                    continue
+                if dirty and name in dirty:
+                    if skip_dirty:
+                        continue
+                    dirty.discard(name)
+                store[index] = values[key]
+                if python_values:
+                    python_values.pop(index, None)
+        return load_values
+
+    @staticmethod
+    def _serializer(field_list):
+        """
+        Create a function converting a dictionary with Python values (using
+        Python names) to a dictionary with API values (using API keys).
+        """
+        names = tuple((field.name, field.key, field.from_python)
+                      for field in field_list)
+
+        def serialize(values):
+            return {key: from_python(values[name])
+                    for name, key, from_python in names if name in values}
+        return serialize
+
+    @staticmethod
+    def _getter(field, index):
+        # Field values of a resource that is not loaded yet are retrieved from
+        # the server, except for the URI which is always known.
+        load = field.name != 'uri'
+
         def getter_for_field(self):
-            return field.to_python(self._values.get(field.name), self)
+            if load and not self._loaded:
+                self.refresh(skip_dirty=True)
+            # Converted values are cached until the API value changes.
+            if not field.cacheable:
+                return field.to_python(self._values[index], self)
+            python_values = self._python_values
+            if python_values is None:
+                python_values = self._python_values = {}
+            try:
+                return python_values[index]
+            except KeyError:
+                value = field.to_python(self._values[index], self)
+                python_values[index] = value
+                return value
         return getter_for_field
 
     @staticmethod
-    def _setter(field):
+    def _setter(field, index):
         def setter_for_field(self, value):
             # TODO: validation?
+            if self._dirty is None:
+                self._dirty = set()
             self._dirty.add(field.name)
-            self._values[field.name] = field.from_python(value)
+            self._values[index] = field.from_python(value)
+            if self._python_values:
+                self._python_values.pop(index, None)
         return setter_for_field
 
 
@@ -126,8 +228,7 @@ class Resource(object):
     Resource fields are defined as class attributes by :mod:`Field` instances.
     """
     __metaclass__ = ResourceMeta
-
-    # Todo: Use embedded resources to avoid many separate requests.
+    __slots__ = ('session', '_values', '_python_values', '_dirty', '_loaded')
 
     # Key for this resource type is used in API response objects as index for
     # the resource definition and with the ``_collection`` suffix as index in
@@ -141,7 +242,7 @@ class Resource(object):
     #: Resource URI.
     uri = String()
 
-    def __init__(self, session, values):
+    def __init__(self, session, values, lazy=False):
         """
         Create a representation for a server resource from a dictionary.
 
@@ -149,20 +250,29 @@ class Resource(object):
         :type session: :class:`.Session`
         :arg values: Dictionary with field values (using API keys and values).
         :type values: dict
+        :arg bool lazy: If `True`, `values` only has the resource URI and the
+          other field values are retrieved from the server on first access.
         """
         #: The session this resource is attached to as
         #: :class:`.Session <Session>`.
         self.session = session
 
         #: Initialize fields with default values.
-        self._values = {field.name: field.default for field in self._fields}
+        self._values = list(self._defaults)
+
+        # Python values converted from `_values` by field getters, by field
+        # position (allocated on first use).
+        self._python_values = None
 
-        # Names of fields that are dirty.
-        self._dirty = set()
+        # Names of fields that are dirty (allocated on first use).
+        self._dirty = None
 
         # Load field values from parsed response JSON.
         self._load_values(values)
 
+        # False if field values have not been retrieved from the server.
+        self._loaded = not lazy
+
     @classmethod
     def create(cls, session, values=None, files=None):
         """
@@ -179,11 +289,7 @@ class Resource(object):
 
         Every subclass should override this with an informative docstring.
         """
-        values = values or {}
-
-        data = {field.key: field.from_python(values[field.name])
-                for field in cls._fields
-                if field.name in values}
+        data = cls._serialize(values or {})
 
         kwargs = {'data': data}
         if files:
@@ -200,17 +306,14 @@ class Resource(object):
         :arg dict values: Dictionary with field values (using API keys and
           values).
         """
-        for field in self._fields:
-            if field.key not in values:
-                continue
-            if skip_dirty and field.name in self._dirty:
-                continue
-            self._values.update({field.name: values[field.key]})
-            self._dirty.discard(field.name)
+        self._load(self, values, skip_dirty=skip_dirty)
+        self._loaded = True
 
     def __repr__(self):
         if self._values:
-            values = ' ' + ' '.join('%s=%r' % x for x in self._values.items())
+            values = ' ' + ' '.join(
+                '%s=%r' % (field.name, value)
+                for field, value in zip(self._field_list, self._values))
         else:
             values = ''
         return '<%s%s>' % (self.__class__.__name__, values)
@@ -232,6 +335,21 @@ class Resource(object):
         """
         return bool(self._dirty)
 
+    @property
+    def loaded(self):
+        """
+        `True` if field values have been retrieved from the server, `False`
+        if they will be retrieved on first access.
+        """
+        return self._loaded
+
+    def expire(self):
+        """
+        Mark the field values as outdated, so they are refreshed from the
+        server on next access (skipping dirty field values).
+        """
+        self._loaded = False
+
     def refresh(self, skip_dirty=False):
         """
         Refresh resource with data from the server.
@@ -240,7 +358,9 @@ class Resource(object):
           unsaved changes.
         """
         response = self.session.get(self.uri)
-        self._load_values(response.json()[self.key], skip_dirty=skip_dirty)
+        self._load_values(self.session.decode(response)[self.key],
+                          skip_dirty=skip_dirty)
+        self.session._cache_resource(self)
 
     def save(self):
         """
@@ -252,7 +372,8 @@ class Resource(object):
                     for field in self._fields
                     if field.name in self._dirty}
             response = self.session.patch(self.uri, data=data)
-            self._load_values(response.json()[self.key])
+            self._load_values(self.session.decode(response)[self.key])
+            self.session._cache_resource(self)
         else:
             self.refresh()
 
@@ -263,11 +384,11 @@ class Resource(object):
 
         Keyword arguments use Python names and values.
         """
-        data = {field.key: field.from_python(values[field.name])
-                for field in self._fields
-                if field.name in values}
+        data = self._serialize(values)
         response = self.session.patch(self.uri, data=data)
-        self._load_values(response.json()[self.key], skip_dirty=True)
+        self._load_values(self.session.decode(response)[self.key],
+                          skip_dirty=True)
+        self.session._cache_resource(self)
 
 
 class Task(object):
@@ -277,7 +398,14 @@ class Task(object):
     Instances are equiped with the parent resource which they use to query
     task state. This means refreshing the parent resource is directly visible
     on the task.
+
+    Task states queried with :meth:`refresh` are recorded on the parent
+    resource, which is used to estimate the remaining time (:attr:`eta`) and
+    the time to wait before polling again (:meth:`poll_wait`).
     """
+    #: Number of recorded task state observations to keep.
+    history_size = 20
+
     def __init__(self, resource):
         self.resource = resource
         # We use `_state` in `to_api`.
@@ -299,7 +427,7 @@ class Task(object):
 
     @property
     def _task(self):
-        return self.resource._values['task']
+        return self.resource._values[self.resource._field_index['task']]
 
     @property
     def state(self):
@@ -360,27 +488,110 @@ class Task(object):
         """
         return self._task.get('progress')
 
+    @property
+    def history(self):
+        """
+        List of recorded task state observations as `(time, progress)`
+        tuples, where `progress` is `None` if the task was waiting.
+        """
+        return list(getattr(self.resource, '_task_history', None) or [])
+
+    def _record(self):
+        """
+        Record the current task state (if waiting or running).
+        """
+        history = getattr(self.resource, '_task_history', None)
+        if history is None:
+            history = collections.deque(maxlen=self.history_size)
+            self.resource._task_history = history
+        if self.waiting:
+            history.append((time.time(), None))
+        elif self.running:
+            history.append((time.time(), self.progress or 0))
+
+    @property
+    def eta(self):
+        """
+        Estimated number of seconds until the task is finished if
+        :attr:`state` is ``running``, based on the progress rate in the
+        recorded observations. `None` if there is no estimate.
+        """
+        if not self.running:
+            return None
+        # Only use the latest consecutive running observations without
+        # decreasing progress (the task might have been resubmitted).
+        observations = []
+        for timestamp, progress in reversed(self.history):
+            if progress is None or (observations and
+                                    progress > observations[-1][1]):
+                break
+            observations.append((timestamp, progress))
+        if len(observations) < 2:
+            return None
+        (last_time, last_progress), (first_time, first_progress) = \
+            observations[0], observations[-1]
+        if last_progress <= first_progress or last_time <= first_time:
+            return None
+        rate = (last_progress - first_progress) / float(last_time -
+                                                        first_time)
+        return max(0, (100 - last_progress) / rate -
+                   (time.time() - last_time))
+
+    def poll_wait(self):
+        """
+        Time to wait before polling the task state again (in seconds).
+
+        While the task is waiting, this doubles with every recorded waiting
+        observation. While the task is running, this is half of :attr:`eta`,
+        so we poll sparsely at first and more often near the expected finish.
+        The result is bounded by :attr:`~manwe.default_config.TASK_POLL_WAIT`
+        and :attr:`~manwe.default_config.TASK_POLL_MAX_WAIT`.
+        """
+        config = self.resource.session.config
+        minimum = config.TASK_POLL_WAIT
+        maximum = max(minimum, config.TASK_POLL_MAX_WAIT)
+
+        wait_time = minimum
+        if self.waiting:
+            waiting = 0
+            for _, progress in reversed(self.history):
+                if progress is not None:
+                    break
+                waiting += 1
+            wait_time = minimum * 2 ** min(max(0, waiting - 1), 32)
+        elif self.running:
+            eta = self.eta
+            if eta is not None:
+                wait_time = eta / 2
+        return min(max(minimum, wait_time), maximum)
+
+    def refresh(self):
+        """
+        Query the task state from the server (refreshing the parent resource,
+        skipping dirty field values) and record it.
+        """
+        self.resource.refresh(skip_dirty=True)
+        self._record()
+
     def wait_and_monitor(self):
         """
         Iterator, yielding :attr:`progress` while :attr:`state` is ``waiting``
-        or ``running``, polling the server every
-        :attr:`~manwe.default_config.TASK_POLL_WAIT` seconds.
+        or ``running``, polling the server every :meth:`poll_wait` seconds.
 
         After that, yield `100`, or raise :attr:`error` if :attr:`state` is
         ``failure``.
         """
-        wait_time = self.resource.session.config.TASK_POLL_WAIT
         last_poll = time.time()
 
         while self.waiting or self.running:
             yield self.progress
 
             # Some time might have been spent before the next yield is asked
-            # for, so instead of sleeping for `wait_time`, we sleep for the
-            # part of `wait_time` that is still left.
-            time.sleep(max(0, wait_time - (time.time() - last_poll)))
+            # for, so instead of sleeping for the wait time, we sleep for the
+            # part of it that is still left.
+            time.sleep(max(0, self.poll_wait() - (time.time() - last_poll)))
 
-            self.resource.refresh(skip_dirty=True)
+            self.refresh()
             last_poll = time.time()
 
         if self.success:
@@ -391,11 +602,31 @@ class Task(object):
     def wait(self):
         """
         Block while :attr:`state` is ``waiting`` or ``running``, polling the
-        server every :attr:`~manwe.default_config.TASK_POLL_WAIT` seconds.
+        server every :meth:`poll_wait` seconds.
         """
         for _ in self.wait_and_monitor():
             pass
 
+    def as_future(self):
+        """
+        Get a future for this task, resolved by the shared background poller
+        of the session (see :attr:`.Session.task_poller`).
+
+        Example::
+
+            >>> future = variation.task.as_future()
+            >>> future.add_done_callback(lambda future: log('imported'))
+            >>> do_other_work()
+            >>> future.result(timeout=3600)
+
+        :return: Future that is done when the task is finished. Its result is
+          this task, or if the task failed, its exception is :attr:`error`.
+          Cancelling the future only stops waiting for the task, not the task
+          itself.
+        :rtype: concurrent.futures.Future
+        """
+        return self.resource.session.task_poller.submit(self)
+
     def resubmit(self):
         """
         Resubmit task.
@@ -407,15 +638,519 @@ class Task(object):
             self._state = None
 
 
+class TaskMonitor(object):
+    """
+    Monitor many server tasks at once.
+
+    Unfinished tasks are polled concurrently (using the
+    :attr:`.Session.fanout_executor` thread pool), every task when its
+    :meth:`Task.poll_wait` time has passed. Finished tasks are not polled
+    anymore.
+
+    Example::
+
+        >>> monitor = TaskMonitor(session)
+        >>> for variation in variations:
+        ...     monitor.add(variation.task,
+        ...                 callback=lambda task: log(task.resource.uri))
+        >>> monitor.wait_all()
+    """
+    def __init__(self, session, tasks=None):
+        """
+        Create a task monitor.
+
+        :arg session: Manwë session.
+        :type session: :class:`.Session`
+        :arg tasks: Tasks to monitor.
+        :type tasks: iterable(:class:`Task`)
+        """
+        #: The session this task monitor is attached to as
+        #: :class:`.Session <Session>`.
+        self.session = session
+
+        self._tasks = []
+        self._pending = []
+        self._finished = []
+        self._callbacks = {}
+
+        for task in tasks or []:
+            self.add(task)
+
+    def add(self, task, callback=None):
+        """
+        Add a task to monitor.
+
+        :arg task: The task.
+        :type task: :class:`Task`
+        :arg callback: Function to call with the task as argument when it is
+          finished (succeeded or failed).
+        """
+        self._tasks.append(task)
+        self._pending.append(task)
+        if callback is not None:
+            self._callbacks[task] = callback
+
+    @property
+    def tasks(self):
+        """
+        List of all monitored tasks.
+        """
+        return list(self._tasks)
+
+    @property
+    def pending(self):
+        """
+        List of monitored tasks that are not known to be finished.
+        """
+        return list(self._pending)
+
+    @property
+    def finished(self):
+        """
+        List of monitored tasks that are finished, in order of completion.
+        """
+        return list(self._finished)
+
+    @property
+    def progress(self):
+        """
+        Aggregate progress of all monitored tasks in the range `0` to `100`.
+
+        Waiting tasks count as `0` and finished tasks as `100`.
+        """
+        if not self._tasks:
+            return 100
+        total = 0
+        for task in self._tasks:
+            if task.running:
+                total += task.progress or 0
+            elif not task.waiting:
+                total += 100
+        return total // len(self._tasks)
+
+    def poll(self):
+        """
+        Query the state of all pending tasks from the server concurrently.
+
+        :return: Tasks that finished since the last poll.
+        :rtype: list(:class:`Task`)
+        """
+        finished = self._collect()
+        if self._pending:
+            self._refresh(self._pending)
+            finished.extend(self._collect())
+        return finished
+
+    def _refresh(self, tasks):
+        """
+        Query the state of tasks concurrently.
+        """
+        # Consume the results so we get exceptions raised by the requests.
+        list(self.session.fanout_executor.map(lambda task: task.refresh(),
+                                              tasks))
+
+    def _collect(self):
+        """
+        Move finished tasks from the pending tasks to the finished tasks and
+        call their callbacks.
+
+        :return: The newly finished tasks.
+        """
+        finished = [task for task in self._pending
+                    if not (task.waiting or task.running)]
+        for task in finished:
+            self._pending.remove(task)
+            self._finished.append(task)
+            callback = self._callbacks.pop(task, None)
+            if callback is not None:
+                callback(task)
+        return finished
+
+    def _monitor(self):
+        """
+        Iterator polling every pending task after its :meth:`Task.poll_wait`
+        time, yielding after every poll (and once before polling).
+        """
+        # Time of the next poll by task.
+        next_poll = {}
+
+        self._collect()
+        while True:
+            yield
+            if not self._pending:
+                return
+
+            now = time.time()
+            for task in self._pending:
+                if task not in next_poll:
+                    next_poll[task] = now + task.poll_wait()
+            time.sleep(max(0, min(next_poll[task] for task in self._pending)
+                           - now))
+
+            now = time.time()
+            due = [task for task in self._pending if next_poll[task] <= now]
+            self._refresh(due)
+            now = time.time()
+            for task in due:
+                next_poll[task] = now + task.poll_wait()
+            self._collect()
+
+    def wait_and_monitor(self):
+        """
+        Iterator, yielding :attr:`progress` while any task is pending.
+
+        After that, yield `100`. If any task fails, its error is raised.
+        """
+        for _ in self._monitor():
+            for task in self._finished:
+                if task.failure:
+                    raise task.error
+            if not self._pending:
+                break
+            yield self.progress
+        yield 100
+
+    def wait_all(self):
+        """
+        Block while any task is pending. If any task fails, its error is
+        raised.
+        """
+        for _ in self.wait_and_monitor():
+            pass
+
+    def wait_any(self):
+        """
+        Block until at least one task is finished (which might already be the
+        case).
+
+        :return: Tasks that are finished (check their :attr:`Task.error`).
+        :rtype: list(:class:`Task`)
+        """
+        for _ in self._monitor():
+            if self._finished:
+                break
+        return self.finished
+
+
+class TaskPoller(object):
+    """
+    Background poller resolving futures for server tasks.
+
+    A single thread polls the tasks of all pending futures concurrently
+    (using the :attr:`.Session.fanout_executor` thread pool), every task
+    when its :meth:`Task.poll_wait` time has passed. The thread is started
+    when needed and stops when there are no pending futures.
+
+    Future callbacks are called from the poller thread, so they should not
+    block. Use :meth:`Task.as_future` to get a future from the poller of the
+    session.
+    """
+    def __init__(self, session):
+        """
+        Create a task poller.
+
+        :arg session: Manwë session.
+        :type session: :class:`.Session`
+        """
+        #: The session this task poller is attached to as
+        #: :class:`.Session <Session>`.
+        self.session = session
+
+        # Tasks and times of their next poll, by pending future.
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._thread = None
+
+    @property
+    def pending(self):
+        """
+        List of tasks with pending futures.
+        """
+        with self._condition:
+            return [task for task, _ in self._pending.values()]
+
+    def submit(self, task):
+        """
+        Get a future for a task.
+
+        :arg task: The task.
+        :type task: :class:`Task`
+
+        :return: Future that is done when the task is finished (see
+          :meth:`Task.as_future`).
+        :rtype: concurrent.futures.Future
+        """
+        future = concurrent.futures.Future()
+        if not (task.waiting or task.running):
+            self._resolve(future, task)
+            return future
+
+        with self._condition:
+            self._pending[future] = task, time.time() + task.poll_wait()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name='manwe-task-poller')
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify()
+        return future
+
+    def _run(self):
+        """
+        Poll tasks until there are no pending futures.
+        """
+        while True:
+            with self._condition:
+                while True:
+                    for future in self._pending.keys():
+                        if future.cancelled():
+                            del self._pending[future]
+                    if not self._pending:
+                        self._thread = None
+                        return
+                    now = time.time()
+                    wait_time = min(next_poll for _, next_poll
+                                    in self._pending.values()) - now
+                    if wait_time <= 0:
+                        break
+                    self._condition.wait(wait_time)
+                due = [(future, task) for future, (task, next_poll)
+                       in self._pending.items() if next_poll <= now]
+
+            # Tasks of the same resource are polled only once.
+            tasks = {}
+            for _, task in due:
+                tasks.setdefault(task.resource, task)
+            errors = dict(zip(tasks, self.session.fanout_executor.map(
+                self._refresh, tasks.values())))
+
+            finished = []
+            with self._condition:
+                now = time.time()
+                for future, task in due:
+                    error = errors[task.resource]
+                    if error is None and (task.waiting or task.running):
+                        if future in self._pending:
+                            self._pending[future] = (
+                                task, now + task.poll_wait())
+                    else:
+                        self._pending.pop(future, None)
+                        finished.append((future, task, error))
+
+            # Resolve futures outside the lock, callbacks might submit new
+            # tasks.
+            for future, task, error in finished:
+                self._resolve(future, task, error)
+
+    @staticmethod
+    def _refresh(task):
+        """
+        Query the state of a task, returning an exception instead of raising
+        it.
+        """
+        try:
+            task.refresh()
+        except Exception as e:
+            return e
+
+    @staticmethod
+    def _resolve(future, task, error=None):
+        """
+        Set the outcome of the future for a finished task (unless the future
+        is cancelled).
+        """
+        if not future.set_running_or_notify_cancel():
+            return
+        if error is None and task.failure:
+            error = task.error
+        if error is None:
+            future.set_result(task)
+        else:
+            future.set_exception(error)
+
+
+class TaskScheduler(object):
+    """
+    Admission control for server tasks.
+
+    Creating resources with tasks (e.g., variations and annotations) is
+    queued locally and at most :attr:`max_running` tasks submitted via the
+    scheduler run on the server at the same time. Queued submissions are
+    started in order of priority as running tasks are observed to be finished
+    by the shared background poller (see :meth:`Task.as_future`).
+
+    Example::
+
+        >>> scheduler = session.task_scheduler
+        >>> futures = [scheduler.submit(session.create_variation, sample,
+        ...                             data_source)
+        ...            for sample, data_source in imports]
+        >>> scheduler.queued
+        480
+        >>> variations = [future.result() for future in futures]
+    """
+    def __init__(self, session, max_running=None):
+        """
+        Create a task scheduler.
+
+        :arg session: Manwë session.
+        :type session: :class:`.Session`
+        :arg int max_running: Maximum number of running tasks. If `None`,
+          :attr:`~manwe.default_config.MAX_RUNNING_TASKS` is used.
+        """
+        #: The session this task scheduler is attached to as
+        #: :class:`.Session <Session>`.
+        self.session = session
+
+        #: Maximum number of running tasks, or `None` for no limit.
+        self.max_running = (session.config.MAX_RUNNING_TASKS
+                            if max_running is None else max_running)
+
+        # Queued submissions as a heap of (negated priority, sequence number,
+        # future, function, arguments, keyword arguments) tuples.
+        self._queue = []
+        self._sequence = itertools.count()
+        self._running = 0
+        self._shutdown = False
+        self._lock = threading.Lock()
+
+    @property
+    def queued(self):
+        """
+        Number of queued submissions (not cancelled).
+        """
+        with self._lock:
+            return sum(1 for entry in self._queue if not entry[2].cancelled())
+
+    @property
+    def running(self):
+        """
+        Number of submitted tasks that are not known to be finished.
+        """
+        with self._lock:
+            return self._running
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Schedule `function` to be called with the given arguments, creating a
+        resource with a task.
+
+        :arg function: Function creating a resource with a task, e.g.,
+          :meth:`.Session.create_variation`.
+        :arg int priority: Submissions with higher priority are started first
+          (default is `0`). Submissions with equal priority are started in
+          order. This keyword argument is not passed to `function`.
+
+        :return: Future for the created resource. Cancelling the future
+          removes the submission from the queue if it was not started yet.
+        :rtype: concurrent.futures.Future
+
+        :raises RuntimeError: If the scheduler was shut down (see
+          :meth:`shutdown`).
+        """
+        priority = kwargs.pop('priority', 0)
+        future = concurrent.futures.Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('cannot schedule new submissions after '
+                                   'shutdown')
+            heapq.heappush(self._queue, (-priority, next(self._sequence),
+                                         future, function, args, kwargs))
+        self._release()
+        return future
+
+    def shutdown(self):
+        """
+        Stop starting queued submissions and cancel them. Tasks that were
+        already started are not affected.
+
+        This is called by :meth:`.Session.close`.
+        """
+        with self._lock:
+            self._shutdown = True
+            queue, self._queue = self._queue, []
+        for entry in queue:
+            entry[2].cancel()
+
+    def _release(self):
+        """
+        Start queued submissions while the number of running tasks is below
+        the limit.
+        """
+        while True:
+            with self._lock:
+                if self._shutdown or not self._queue or (
+                        self.max_running is not None and
+                        self._running >= self.max_running):
+                    return
+                _, _, future, function, args, kwargs = heapq.heappop(
+                    self._queue)
+                if not future.set_running_or_notify_cancel():
+                    continue
+                self._running += 1
+            try:
+                self.session.executor.submit(self._start, future, function,
+                                             args, kwargs)
+            except RuntimeError as e:
+                # The executor was shut down. This usually runs in a callback
+                # of the task poller, where raising would go unnoticed.
+                future.set_exception(e)
+                with self._lock:
+                    self._running -= 1
+                self.shutdown()
+                return
+
+    def _start(self, future, function, args, kwargs):
+        """
+        Create the resource and release its slot when its task is finished.
+        """
+        try:
+            resource = function(*args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+            self._finish()
+            return
+        future.set_result(resource)
+        try:
+            resource.task.as_future().add_done_callback(
+                lambda _: self._finish())
+        except Exception as e:
+            # We cannot wait for the task, so we release its slot now.
+            logger.warn('Unable to wait for task of %s: %s', resource, e)
+            self._finish()
+
+    def _finish(self):
+        """
+        Release the slot of a finished task.
+        """
+        with self._lock:
+            self._running -= 1
+        self._release()
+
+
 class TaskedResource(Resource):
     """
     Base class for representing server resources with tasks.
     """
+    # Recorded task state observations (see `Task.history`).
+    __slots__ = ('_task_history',)
+
+    # Task instances only refer to the resource, so they can be cached.
     task = Custom(
-        Task.from_api, Task.to_api,
+        Task.from_api, Task.to_api, cacheable=True,
         doc='Server task (:class:`Task` instance).')
 
 
+#: Page size decision made by a resource collection in adaptive mode, as
+#: recorded in :attr:`ResourceCollection.page_sizes`. The `start` and `size`
+#: fields define the requested range, `items` is the number of resources
+#: received, `elapsed` is the request time in seconds, `bytes` is the response
+#: size, and `next_size` is the chosen page size for the next request. If the
+#: range was refused by the server, `elapsed` and `bytes` are `None`.
+PageSize = collections.namedtuple(
+    'PageSize', ['start', 'size', 'items', 'elapsed', 'bytes', 'next_size'])
+
+
 class ResourceCollection(object):
     """
     Base class for representing server resource collections, iterators
@@ -429,7 +1164,14 @@ class ResourceCollection(object):
     #: Resource class to use for instantiating resources in this collection.
     resource_class = None
 
-    def __init__(self, session, values=None):
+    #: Names of string fields exported as categorical arrays by default (see
+    #: :meth:`to_arrays`).
+    categorical = ()
+
+    # Collection filter values are always known.
+    _loaded = True
+
+    def __init__(self, session, values=None, embed=None):
         """
         Create a representation for a server resource collection.
 
@@ -438,6 +1180,10 @@ class ResourceCollection(object):
         :arg values: Dictionary with field values (using Python names and
           values).
         :type values: dict
+        :arg embed: Names of link fields for which the linked resources should
+          be included in the response (ignored if the server does not support
+          this).
+        :type embed: iterable(str)
 
         Every subclass should override this with an informative docstring.
         """
@@ -447,6 +1193,9 @@ class ResourceCollection(object):
         #: :class:`.Session <Session>`.
         self.session = session
 
+        #: Names of link fields for which the linked resources are embedded.
+        self.embed = tuple(embed or ())
+
         #: The total number of resources in this collection as last reported
         #: by the server. Note that the actual number of resources produced by
         #: the collection iterator might deviate from this number, and this is
@@ -454,16 +1203,51 @@ class ResourceCollection(object):
         self.size = 0
 
         # API values, not Python values.
-        self._values = {field.name: field.from_python(values[field.name])
+        self._values = [field.from_python(values[field.name])
                         if field.name in values else field.default
-                        for field in self._fields}
+                        for field in self._field_list]
 
         # This is not used.
-        self._dirty = set()
+        self._dirty = None
+
+        # Python values converted from `_values` by field getters.
+        self._python_values = None
 
         # Cached collection of resources.
         self._resources = collections.deque()
 
+        #: If `True`, the number of resources to query per collection request
+        #: (:attr:`cache_size`) is adapted to the observed request times and
+        #: response sizes. By default set to
+        #: :attr:`~manwe.default_config.COLLECTION_ADAPTIVE`.
+        self.adaptive = session.config.COLLECTION_ADAPTIVE
+
+        #: List of :class:`PageSize` tuples recording the page size decisions
+        #: made in adaptive mode.
+        self.page_sizes = []
+
+        #: Number of pages to retrieve in the background (on the
+        #: :attr:`.Session.fanout_executor` thread pool) while iterating over
+        #: the collection. By default set to
+        #: :attr:`~manwe.default_config.COLLECTION_READ_AHEAD`.
+        self.read_ahead = session.config.COLLECTION_READ_AHEAD
+
+        # Pages we are reading ahead as (start, stop, future) tuples.
+        self._pages = collections.deque()
+
+        #: If `True`, resources are decoded from collection responses while
+        #: they are received (unless :attr:`read_ahead` is used or resources
+        #: are prefetched). By default set to
+        #: :attr:`~manwe.default_config.COLLECTION_STREAM`.
+        self.stream = session.config.COLLECTION_STREAM
+
+        # Iterator over resource representations in the page we are
+        # receiving in streaming mode.
+        self._stream = None
+
+        # Names of link fields to prefetch for every page of resources.
+        self._prefetch = ()
+
         # Start from the beginning.
         self.reset()
 
@@ -477,14 +1261,22 @@ class ResourceCollection(object):
     def reset(self):
         """
         Reset resource collection iterator.
+
+        This also resets :attr:`cache_size` to the current
+        :attr:`~manwe.default_config.COLLECTION_CACHE_SIZE` value.
         """
+        self._cache_size = self.session.config.COLLECTION_CACHE_SIZE
         self._next = 0
         self._resources.clear()
+        self._cancel_pages()
+        self._close_stream()
         self._get_resources()
 
     def __repr__(self):
         if self._values:
-            values = ' ' + ' '.join('%s=%r' % x for x in self._values.items())
+            values = ' ' + ' '.join(
+                '%s=%r' % (field.name, value)
+                for field, value in zip(self._field_list, self._values))
         else:
             values = ''
         return '<%s%s>' % (self.__class__.__name__, values)
@@ -492,48 +1284,457 @@ class ResourceCollection(object):
     def __iter__(self):
         return self
 
+    def prefetch(self, *fields):
+        """
+        Retrieve the resources linked by `fields` concurrently for every page
+        of resources in the collection (see :meth:`.Session.prefetch`).
+
+        Example::
+
+            >>> for sample in session.samples().prefetch('user', 'groups'):
+            ...     print sample.user.name
+
+        :arg fields: Names of link fields (or sets of links) to prefetch.
+        :type fields: str
+
+        :return: The resource collection.
+        :rtype: :class:`.ResourceCollection`
+
+        :raises ValueError: If `fields` contains a name that is not a link
+          field (or set of links) of the resources.
+        """
+        self.session._check_link_fields(self.resource_class, fields)
+        self._prefetch = fields
+        self.session.prefetch(self._resources, *fields)
+        return self
+
     @property
     def cache_size(self):
         """
         Number of resources to query per collection request.
+
+        This is :attr:`~manwe.default_config.COLLECTION_CACHE_SIZE` as it
+        was when the collection was created or last reset (see
+        :meth:`reset`), unless :attr:`adaptive` is `True` in which case it
+        changes based on the observed request times.
         """
-        return self.session.config.COLLECTION_CACHE_SIZE
+        return self._cache_size
 
-    def _get_resources(self):
-        if self._next is None:
-            return
-        range_ = werkzeug.datastructures.Range(
-            'items', [(self._next, self._next + self.cache_size)])
+    def fetch_all(self, workers=None):
+        """
+        Retrieve all remaining resources in the collection with concurrent
+        requests.
+
+        After the first request, the size of the collection is known and all
+        remaining ranges are requested at once. The result is in collection
+        order. If the collection grows while doing this, the new resources are
+        also retrieved. Resources that move between ranges because of
+        concurrent modifications are only included once.
+
+        This exhausts the collection iterator.
+
+        :arg int workers: Number of concurrent requests. By default, the
+          :attr:`.Session.fanout_executor` thread pool is used. This is not
+          the :attr:`.Session.executor` thread pool, so this method can be
+          called from code running there (e.g., via
+          :meth:`.AsyncSession.submit`) without all workers waiting for each
+          other.
+
+        :return: Remaining resources in the collection.
+        :rtype: list(:class:`Resource`)
+        """
+        resources = list(self._resources)
+        self._resources.clear()
+        self._cancel_pages()
+        if self._stream is not None:
+            resources.extend(
+                self.session._resource_from_values(self.key, item)
+                for item in self._stream)
+            self._stream = None
+
+        if self._next is not None:
+            if workers is None:
+                resources.extend(self._fetch_ranges(
+                    self.session.fanout_executor))
+            else:
+                with concurrent.futures.ThreadPoolExecutor(
+                        max_workers=workers) as executor:
+                    resources.extend(self._fetch_ranges(executor))
+            self._next = None
+
+        seen = set()
+        unique = []
+        for resource in resources:
+            if resource.uri not in seen:
+                seen.add(resource.uri)
+                unique.append(resource)
+        return unique
+
+    def _fetch_ranges(self, executor):
+        """
+        Retrieve the resources from :attr:`_next` up to the end of the
+        collection using concurrent requests on `executor`.
+        """
+        step = self.cache_size
+        end = self.size
+        pending = [(start, min(start + step, end))
+                   for start in range(self._next, end, step)]
+        pages = {}
+
+        while pending:
+            results = executor.map(lambda r: self._fetch_page(*r), pending)
+            retry = []
+            for (start, stop), (items, content_range) in zip(pending,
+                                                            results):
+                pages[start] = items
+                if content_range is None:
+                    # The collection shrunk.
+                    continue
+                self.size = content_range.length
+                if content_range.stop < min(stop, content_range.length):
+                    # We got fewer resources than requested.
+                    retry.append((content_range.stop, stop))
+            if self.size > end:
+                # The collection grew.
+                retry.extend((start, min(start + step, self.size))
+                             for start in range(end, self.size, step))
+                end = self.size
+            pending = retry
+
+        resources = [self.session._resource_from_values(self.key, item)
+                     for start in sorted(pages) for item in pages[start]]
+        if self._prefetch:
+            self.session.prefetch(resources, *self._prefetch)
+        return resources
+
+    def to_arrays(self, fields=None, categorical=None):
+        """
+        Export field values of all resources in the collection to NumPy
+        arrays.
+
+        The resource representations are written into the arrays page by
+        page, no :class:`Resource` instances are created. Iteration over the
+        collection is not affected.
+
+        Integer fields are exported as `int64` arrays, boolean fields as
+        `bool` arrays, and timestamps as `datetime64[us]` arrays. String
+        fields (and links, by URI) are exported as
+        :class:`~manwe.arrays.StringArray` tuples of offsets and bytes, or as
+        :class:`~manwe.arrays.CategoricalArray` tuples of codes and
+        categories.
+
+        Example::
+
+            >>> arrays = session.variants().to_arrays(
+            ...     fields=['chromosome', 'position'])
+            >>> arrays['position'].dtype
+            dtype('int64')
+
+        This requires NumPy.
+
+        :arg fields: Names of the fields to export. By default, all fields
+          that can be exported.
+        :type fields: iterable(str)
+        :arg categorical: Names of string fields to export as categorical
+          arrays. By default, :attr:`categorical`.
+        :type categorical: iterable(str)
+
+        :return: Dictionary with field names as keys and arrays as values.
+        :rtype: dict
+
+        :raises ValueError: If a field cannot be exported.
+        """
+        from . import arrays
+
+        resource_fields = {field.name: field
+                           for field in self.resource_class._field_list}
+        if fields is None:
+            fields = [field.name for field in self.resource_class._field_list
+                      if not field.hidden and arrays.exportable(field)]
+        if categorical is None:
+            categorical = self.categorical
+        categorical = set(categorical)
+
+        try:
+            columns = [arrays.create_column(resource_fields[name],
+                                            categorical=name in categorical)
+                       for name in fields]
+        except KeyError as e:
+            raise ValueError('Unknown field: %s' % e.args[0])
+
+        start = 0
+        while True:
+            items, content_range = self._fetch_page(
+                start, start + self.cache_size)
+            if content_range is None or not items:
+                break
+            for column in columns:
+                column.extend(items)
+            start = content_range.stop
+            if start >= content_range.length:
+                break
+
+        return {column.field.name: column.result() for column in columns}
+
+    def count(self):
+        """
+        Query the number of resources in the collection.
+
+        This queries a single resource to read the collection size from the
+        response and updates :attr:`size`.
+
+        :return: Number of resources in the collection.
+        :rtype: int
+        """
+        _, content_range = self._fetch_page(0, 1, adapt=False)
+        self.size = content_range.length if content_range else 0
+        return self.size
+
+    def __getitem__(self, index):
+        """
+        Get a resource or a list of resources by position in the collection.
+
+        Only the requested range is queried from the server and iteration
+        over the collection is not affected. Negative positions and omitted
+        slice boundaries cost an extra request (see :meth:`count`). For a
+        slice with a step larger than :attr:`cache_size`, every selected
+        position is queried with a separate request (concurrently on the
+        :attr:`.Session.fanout_executor` thread pool), otherwise the range
+        spanned by the slice is queried one page at a time.
+        """
+        if isinstance(index, slice):
+            if (index.start is None or index.start < 0 or index.stop is None or
+                index.stop < 0 or (index.step or 1) < 0):
+                positions = range(*index.indices(self.count()))
+            else:
+                positions = range(index.start, index.stop, index.step or 1)
+            if not positions:
+                return []
+            if abs(index.step or 1) > self.cache_size:
+                # A page would mostly hold resources we skip, so don't
+                # retrieve them.
+                pages = self.session.fanout_executor.map(
+                    lambda i: self._fetch_range(i, i + 1), positions)
+                return [resource for page in pages for resource in page]
+            first = min(positions)
+            resources = self._fetch_range(first, max(positions) + 1)
+            return [resources[i - first] for i in positions
+                    if i - first < len(resources)]
+
+        if index < 0:
+            index += self.count()
+        resources = self._fetch_range(index, index + 1) if index >= 0 else []
+        if not resources:
+            raise IndexError('collection index out of range')
+        return resources[0]
+
+    def _fetch_range(self, start, stop):
+        """
+        Retrieve the resources in the collection from `start` up to (but not
+        including) `stop`, using one request per :attr:`cache_size`
+        resources.
+        """
+        items = []
+        while start < stop:
+            page, content_range = self._fetch_page(
+                start, min(stop, start + self.cache_size), adapt=False)
+            if content_range is None or not page:
+                break
+            items.extend(page)
+            start = content_range.stop
+        return [self.session._resource_from_values(self.key, item)
+                for item in items]
+
+    def _fetch_page(self, start, stop, adapt=True, stream=False):
+        """
+        Retrieve the API representations of the resources in the collection
+        from `start` up to (but not including) `stop`.
+
+        This does not modify the collection state (except for the page size
+        in adaptive mode if `adapt` is `True`), so it is safe to call from
+        other threads.
+
+        If `stream` is `True`, the resource representations are decoded
+        while the response is received. In that case the page size is not
+        adapted to the response, since it is not complete yet.
+
+        :return: Tuple of the list (or iterator, if `stream` is `True`) of
+          resource representations and the content range reported by the
+          server (`None` if the range could not be satisfied).
+        """
+        # Importing werkzeug is slow, so we only do it when needed.
+        import werkzeug.datastructures
+        import werkzeug.http
+
+        range_ = werkzeug.datastructures.Range('items', [(start, stop)])
+        started = time.time()
         try:
-            response = self.session.get(
-                uri=self.session.endpoints[self.key + '_collection'],
-                data={field: value for field, value in self._values.items()
+            response = self.session._get_embedded(
+                self.key, self.session.endpoints[self.key + '_collection'],
+                embed=self.embed,
+                data={field.name: value for field, value
+                      in zip(self._field_list, self._values)
                       if value is not None},
-                headers={'Range': range_.to_header()})
-        except UnsatisfiableRangeError:
+                headers={'Range': range_.to_header()},
+                stream=stream)
+        except (RequestEntityTooLargeError, UnsatisfiableRangeError) as e:
+            # In adaptive mode, we retry with a smaller range if the server
+            # refuses a range within the collection.
+            if (adapt and self.adaptive and stop - start > 1 and
+                (isinstance(e, RequestEntityTooLargeError) or
+                 start < self.size)):
+                self._adapt_cache_size(start, stop, [], None, None)
+                return self._fetch_page(start, start + self.cache_size,
+                                        stream=stream)
+            if isinstance(e, RequestEntityTooLargeError):
+                raise
             # Todo: If we'd store the response object in the error object, we
             #     could check for the Content-Range header and if it's present
             #     use it to set `self.size`.
+            return [], None
+        content_range = werkzeug.http.parse_content_range_header(
+            response.headers['Content-Range'])
+        if stream:
+            return self._iter_items(response), content_range
+        items = self.session.decode(response)[
+            self.key + '_collection']['items']
+        if adapt and self.adaptive:
+            self._adapt_cache_size(start, stop, items, time.time() - started,
+                                   len(response.content))
+        return items, content_range
+
+    def _iter_items(self, response):
+        """
+        Iterate over the resource representations in a streamed collection
+        response.
+        """
+        try:
+            for item in iter_array(
+                    response.iter_content(
+                        chunk_size=self.session.config.DATA_BUFFER_SIZE),
+                    [self.key + '_collection', 'items'],
+                    decoder=self.session.codec.decoder):
+                yield item
+        finally:
+            response.close()
+
+    def _adapt_cache_size(self, start, stop, items, elapsed, bytes_):
+        """
+        Choose the number of resources to query per collection request based
+        on the last request.
+
+        The page size is halved if the request was slow or refused (`elapsed`
+        is `None`) and doubled if it was fast, up to a maximum number of
+        resources and bytes per request.
+        """
+        config = self.session.config
+        size = stop - start
+        if elapsed is None or elapsed > config.COLLECTION_PAGE_TIME:
+            cache_size = max(1, size // 2)
+        elif elapsed < config.COLLECTION_PAGE_TIME / 2 and len(items) == size:
+            cache_size = size * 2
+            # Bytes per resource tells us how large a page we can afford.
+            cache_size = min(cache_size,
+                             config.COLLECTION_PAGE_BYTES * size // bytes_)
+        else:
+            cache_size = size
+        self._cache_size = max(1, min(cache_size,
+                                      config.COLLECTION_CACHE_SIZE_MAX))
+        self.page_sizes.append(
+            PageSize(start, size, len(items), elapsed, bytes_,
+                     self._cache_size))
+
+    def _get_resources(self):
+        if self._next is None:
+            return
+        if self.read_ahead > 0:
+            self._schedule_pages()
+            start, stop, future = self._pages.popleft()
+            try:
+                items, content_range = future.result()
+            except Exception:
+                # Pages after the failed one are discarded, so a next attempt
+                # starts at the failed page again.
+                self._cancel_pages()
+                raise
+        else:
+            start, stop = self._next, self._next + self.cache_size
+            items, content_range = self._fetch_page(
+                start, stop, stream=self.stream and not self._prefetch)
+        self._add_page(stop, items, content_range)
+
+    def _add_page(self, stop, items, content_range):
+        """
+        Add resources from a retrieved page to the cached resources and
+        advance to the next page.
+        """
+        if content_range is None:
             self.size = 0
             self._next = None
+            self._cancel_pages()
             return
-        self._resources.extend(
-            self.resource_class(self.session, resource)
-            for resource in response.json()[self.key + '_collection']['items'])
-        content_range = werkzeug.http.parse_content_range_header(
-            response.headers['Content-Range'])
+        if isinstance(items, list):
+            resources = [self.session._resource_from_values(self.key, item)
+                         for item in items]
+            if self._prefetch:
+                self.session.prefetch(resources, *self._prefetch)
+            self._resources.extend(resources)
+        else:
+            # Resources are created from the stream by `next`.
+            self._stream = items
         self.size = content_range.length
         if content_range.stop < content_range.length:
-            self._next += self.cache_size
+            self._next = content_range.stop
+            # The server returned fewer resources than requested, so pages we
+            # are reading ahead do not line up anymore.
+            if content_range.stop != stop:
+                self._cancel_pages()
         else:
             self._next = None
+            self._cancel_pages()
+
+    def _schedule_pages(self):
+        """
+        Make sure we are retrieving the next page and up to
+        :attr:`read_ahead` pages after that in the background.
+        """
+        start = self._pages[-1][1] if self._pages else self._next
+        while not self._pages or (len(self._pages) <= self.read_ahead and
+                                  start < self.size):
+            stop = start + self.cache_size
+            future = self.session.fanout_executor.submit(self._fetch_page,
+                                                         start, stop)
+            self._pages.append((start, stop, future))
+            start = stop
+
+    def _cancel_pages(self):
+        """
+        Discard pages we are reading ahead.
+        """
+        for _, _, future in self._pages:
+            future.cancel()
+        self._pages.clear()
+
+    def _close_stream(self):
+        """
+        Discard the page we are receiving in streaming mode.
+        """
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
 
     def next(self):
         """
         Return the next resource in the collection.
         """
+        if self._stream is not None:
+            for item in self._stream:
+                return self.session._resource_from_values(self.key, item)
+            self._stream = None
         if not self._resources:
             self._get_resources()
+            if self._stream is not None:
+                return self.next()
         try:
             return self._resources.popleft()
         except IndexError:
@@ -595,14 +1796,18 @@ class AnnotationCollection(ResourceCollection):
     """
     resource_class = Annotation
 
-    def __init__(self, session):
+    def __init__(self, session, embed=None):
         """
         Query an annotation resource collection.
 
+        :arg embed: Names of link fields for which the linked resources should
+          be included in the response.
+        :type embed: iterable(str)
+
         :return: An annotation resource collection.
         :rtype: :class:`.AnnotationCollection`
         """
-        super(AnnotationCollection, self).__init__(session)
+        super(AnnotationCollection, self).__init__(session, embed=embed)
 
 
 class Coverage(TaskedResource):
@@ -644,18 +1849,22 @@ class CoverageCollection(ResourceCollection):
     sample = Link('sample',
                   doc='Collection is filtered by this :class:`Sample`.')
 
-    def __init__(self, session, sample=None):
+    def __init__(self, session, sample=None, embed=None):
         """
         Query a coverage resource collection.
 
         :arg sample: Filter collection by sample.
         :type sample: :class:`.Sample`
+        :arg embed: Names of link fields for which the linked resources should
+          be included in the response.
+        :type embed: iterable(str)
 
         :return: A coverage resource collection.
         :rtype: :class:`.CoverageCollection`
         """
         values = {'sample': sample}
-        super(CoverageCollection, self).__init__(session, values=values)
+        super(CoverageCollection, self).__init__(session, values=values,
+                                                 embed=embed)
 
 
 class DataSource(Resource):
@@ -712,18 +1921,22 @@ class DataSourceCollection(ResourceCollection):
     user = Link('user',
                 doc='Collection is filtered by this :class:`User`.')
 
-    def __init__(self, session, user=None):
+    def __init__(self, session, user=None, embed=None):
         """
         Query a data source resource collection.
 
         :arg user: Filter collection by user.
         :type user: :class:`.User`
+        :arg embed: Names of link fields for which the linked resources should
+          be included in the response.
+        :type embed: iterable(str)
 
         :return: A data source resource collection.
         :rtype: :class:`.DataSourceCollection`
         """
         values = {'user': user}
-        super(DataSourceCollection, self).__init__(session, values=values)
+        super(DataSourceCollection, self).__init__(session, values=values,
+                                                   embed=embed)
 
 
 class Group(Resource):
@@ -755,14 +1968,18 @@ class GroupCollection(ResourceCollection):
     """
     resource_class = Group
 
-    def __init__(self, session):
+    def __init__(self, session, embed=None):
         """
         Query a group resource collection.
 
+        :arg embed: Names of link fields for which the linked resources should
+          be included in the response.
+        :type embed: iterable(str)
+
         :return: A group resource collection.
         :rtype: :class:`.GroupCollection`
         """
-        super(GroupCollection, self).__init__(session)
+        super(GroupCollection, self).__init__(session, embed=embed)
 
 
 class Sample(Resource):
@@ -827,7 +2044,8 @@ class SampleCollection(ResourceCollection):
     user = Link('user',
                 doc='Collection is filtered by this :class:`User`.')
 
-    def __init__(self, session, groups=None, public=None, user=None):
+    def __init__(self, session, groups=None, public=None, user=None,
+                 embed=None):
         """
         Query a sample resource collection.
 
@@ -837,6 +2055,9 @@ class SampleCollection(ResourceCollection):
         :type public: bool
         :arg user: Filter collection by user.
         :type user: :class:`.User`
+        :arg embed: Names of link fields for which the linked resources should
+          be included in the response.
+        :type embed: iterable(str)
 
         :return: A sample resource collection.
         :rtype: :class:`.SampleCollection`
@@ -844,7 +2065,8 @@ class SampleCollection(ResourceCollection):
         values = {'groups': groups,
                   'public': public,
                   'user': user}
-        super(SampleCollection, self).__init__(session, values=values)
+        super(SampleCollection, self).__init__(session, values=values,
+                                               embed=embed)
 
 
 class User(Resource):
@@ -899,14 +2121,18 @@ class UserCollection(ResourceCollection):
     """
     resource_class = User
 
-    def __init__(self, session):
+    def __init__(self, session, embed=None):
         """
         Query a user resource collection.
 
+        :arg embed: Names of link fields for which the linked resources should
+          be included in the response.
+        :type embed: iterable(str)
+
         :return: A user resource collection.
         :rtype: :class:`.UserCollection`
         """
-        super(UserCollection, self).__init__(session)
+        super(UserCollection, self).__init__(session, embed=embed)
 
 
 class Variant(Resource):
@@ -956,11 +2182,11 @@ class Variant(Resource):
         """
         queries = queries or {}
 
-        variant = self.session.get(
+        response = self.session.get(
             uri=self.uri,
             data={'queries': [{'name': k, 'expression': v}
-                              for k, v in queries.items()]}).json()['variant']
-        return variant['annotations']
+                              for k, v in queries.items()]})
+        return self.session.decode(response)['variant']['annotations']
 
 
 class VariantCollection(ResourceCollection):
@@ -969,15 +2195,20 @@ class VariantCollection(ResourceCollection):
     returning :class:`Variant` instances.
     """
     resource_class = Variant
+    categorical = ('chromosome',)
 
-    def __init__(self, session):
+    def __init__(self, session, embed=None):
         """
         Query a variant resource collection.
 
+        :arg embed: Names of link fields for which the linked resources should
+          be included in the response.
+        :type embed: iterable(str)
+
         :return: A variant resource collection.
         :rtype: :class:`.VariantCollection`
         """
-        super(VariantCollection, self).__init__(session)
+        super(VariantCollection, self).__init__(session, embed=embed)
 
 
 class Variation(TaskedResource):
@@ -1029,15 +2260,19 @@ class VariationCollection(ResourceCollection):
     sample = Link('sample',
                   doc='Collection is filtered by this :class:`Sample`.')
 
-    def __init__(self, session, sample=None):
+    def __init__(self, session, sample=None, embed=None):
         """
         Query a variation resource collection.
 
         :arg sample: Filter collection by sample.
         :type sample: :class:`.Sample`
+        :arg embed: Names of link fields for which the linked resources should
+          be included in the response.
+        :type embed: iterable(str)
 
         :return: A variation resource collection.
         :rtype: :class:`.VariationCollection`
         """
         values = {'sample': sample}
-        super(VariationCollection, self).__init__(session, values=values)
+        super(VariationCollection, self).__init__(session, values=values,
+                                                  embed=embed)
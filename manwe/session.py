@@ -9,17 +9,25 @@ Manwë sessions.
 
 
 import collections
+import concurrent.futures
 import json
 import logging
+import threading
 import urlparse
 
 import requests
-from requests_toolbelt.multipart.encoder import MultipartEncoder
+import requests.adapters
+import requests.structures
 
+from .cache import (CachedResponse, DiskResponseCache, EndpointCache,
+                    ResourceCache, ResponseCache)
+from .codec import Codec, get_codec
 from .config import Config
 from .errors import (ApiError, BadRequestError, ForbiddenError,
-                     NotAcceptableError, NotFoundError, UnauthorizedError,
+                     NotAcceptableError, NotFoundError,
+                     RequestEntityTooLargeError, UnauthorizedError,
                      UnsatisfiableRangeError)
+from .fields import Link, Set
 from . import resources
 
 
@@ -55,6 +63,47 @@ def stringify(value):
     return str(value)
 
 
+class InlineExecutor(concurrent.futures.Executor):
+    """
+    Executor calling functions in the calling thread.
+    """
+    def submit(self, fn, *args, **kwargs):
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        return future
+
+
+class FanOutExecutor(concurrent.futures.ThreadPoolExecutor):
+    """
+    Thread pool executor that knows its own worker threads (see
+    :attr:`Session.fanout_executor`).
+    """
+    def __init__(self, max_workers):
+        super(FanOutExecutor, self).__init__(max_workers)
+        self._local = threading.local()
+
+    def submit(self, fn, *args, **kwargs):
+        return super(FanOutExecutor, self).submit(self._call, fn, args,
+                                                  kwargs)
+
+    def _call(self, fn, args, kwargs):
+        self._local.worker = True
+        return fn(*args, **kwargs)
+
+    @property
+    def in_worker(self):
+        """
+        `True` if the calling thread is one of our worker threads.
+        """
+        return getattr(self._local, 'worker', False)
+
+
 class SessionMeta(type):
     def __new__(cls, name, parents, attributes):
         """
@@ -79,16 +128,22 @@ class SessionMeta(type):
         with `__getattr__`. This enables tab completion and `dir()` without
         having to implement `__dir__`. We can also attach docstrings this way.
         """
-        def get_resource(self, uri):
+        def get_resource(self, uri, lazy=False, embed=None):
             """
             Get a resource of type {key}.
 
             :arg str uri: URI for the {key} to retrieve.
+            :arg bool lazy: If `True`, the {key} is not retrieved until one of
+              its field values other than the URI is accessed.
+            :arg embed: Names of link fields for which the linked resources
+              should be included in the response (ignored if the server does
+              not support this).
+            :type embed: iterable(str)
 
             :return: A resource of type {key}.
             :rtype: :class:`.{collection_class.resource_class.__name__}`
             """
-            return self._get_resource(key, uri)
+            return self._get_resource(key, uri, lazy=lazy, embed=embed)
         get_resource.__doc__ = get_resource.__doc__.format(
             key=key, collection_class=collection_class)
 
@@ -116,7 +171,7 @@ class AbstractSession(object):
     _collections = {}
 
     def __init__(self, api_root=None, token=None, config=None,
-                 log_level=logging.INFO):
+                 log_level=logging.INFO, codec=None):
         """
         Create a session.
 
@@ -130,6 +185,9 @@ class AbstractSession(object):
         :arg log_level: Control the level of log messages you will see. Use
           `log_level=logging.DEBUG` to troubleshoot.
         :type log_level: logging.LOG_LEVEL
+        :arg codec: JSON codec for request and response bodies, or the name
+          of a JSON library (takes precedence over `config`).
+        :type codec: :class:`.Codec` or str
         """
         self.config = config or Config()
 
@@ -138,6 +196,14 @@ class AbstractSession(object):
         if token:
             self.config.TOKEN = token
 
+        codec = codec or self.config.JSON_CODEC
+        if not isinstance(codec, Codec):
+            codec = get_codec(codec)
+
+        #: JSON codec for request and response bodies as
+        #: :class:`.Codec <manwe.codec.Codec>`.
+        self.codec = codec
+
         self.set_log_level(log_level)
         self._api_errors = collections.defaultdict(
             lambda: ApiError, {400: BadRequestError,
@@ -145,8 +211,159 @@ class AbstractSession(object):
                                403: ForbiddenError,
                                404: NotFoundError,
                                406: NotAcceptableError,
+                               413: RequestEntityTooLargeError,
                                416: UnsatisfiableRangeError})
-        self.endpoints = self._lookup_endpoints()
+        self._http = self._create_http_session()
+        self._executor = None
+        self._fanout_executor = None
+        self._task_poller = None
+        self._task_scheduler = None
+        self._resource_cache = ResourceCache(
+            self.config.RESOURCE_CACHE_SIZE,
+            ttl=self.config.RESOURCE_CACHE_TTL)
+        self._http_cache = self._create_http_cache()
+        # Combinations of resource key and embedded fields that the server
+        # does not support.
+        self._unsupported_embeds = set()
+
+        # Futures for GET requests in flight, by request key.
+        self._requests_in_flight = {}
+        self._requests_in_flight_lock = threading.Lock()
+
+        #: Number of ``GET`` requests that were answered by sharing an
+        #: identical request in flight, instead of making their own HTTP
+        #: request (see :meth:`get`).
+        self.coalesced_requests = 0
+
+        if self.config.ENDPOINT_CACHE:
+            self._endpoint_cache = EndpointCache(
+                self.config.ENDPOINT_CACHE,
+                ttl=self.config.ENDPOINT_CACHE_TTL)
+        else:
+            self._endpoint_cache = None
+        # Endpoints are discovered when first needed.
+        self._endpoints = None
+        self._endpoints_cached = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Close all pooled connections to the server.
+
+        Submissions queued on :attr:`task_scheduler` are cancelled.
+
+        The session can still be used afterwards, new connections are opened
+        as needed.
+        """
+        if self._task_scheduler is not None:
+            self._task_scheduler.shutdown()
+            self._task_scheduler = None
+        self._http.close()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._fanout_executor is not None:
+            self._fanout_executor.shutdown()
+            self._fanout_executor = None
+
+    @property
+    def executor(self):
+        """
+        Thread pool executor for running API requests concurrently, as a
+        :class:`concurrent.futures.Executor` with
+        :attr:`~manwe.default_config.MAX_WORKERS` worker threads.
+
+        Worker threads share the pooled connections of this session.
+
+        Code running on this executor (e.g., via :class:`AsyncSession`) can
+        wait for requests made on :attr:`fanout_executor`, but should never
+        wait for other work on this executor, since all workers might be
+        waiting.
+        """
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.config.MAX_WORKERS)
+        return self._executor
+
+    @property
+    def fanout_executor(self):
+        """
+        Thread pool executor for concurrent requests made on behalf of a
+        single call (e.g., reading ahead collection pages), as a
+        :class:`concurrent.futures.Executor` with
+        :attr:`~manwe.default_config.MAX_WORKERS` worker threads.
+
+        This is separate from :attr:`executor`, so waiting for these requests
+        from code running on :attr:`executor` cannot starve. Called from one
+        of its own worker threads, an executor calling functions in the
+        calling thread is returned instead, so nested concurrent requests
+        cannot starve either.
+        """
+        if self._fanout_executor is None:
+            self._fanout_executor = FanOutExecutor(self.config.MAX_WORKERS)
+        if self._fanout_executor.in_worker:
+            return InlineExecutor()
+        return self._fanout_executor
+
+    @property
+    def task_poller(self):
+        """
+        Shared background poller for task futures, as a
+        :class:`.TaskPoller` (see :meth:`.Task.as_future`).
+        """
+        if self._task_poller is None:
+            self._task_poller = resources.TaskPoller(self)
+        return self._task_poller
+
+    @property
+    def task_scheduler(self):
+        """
+        Admission control for server tasks, as a :class:`.TaskScheduler`
+        limiting the number of running tasks to
+        :attr:`~manwe.default_config.MAX_RUNNING_TASKS`.
+        """
+        if self._task_scheduler is None:
+            self._task_scheduler = resources.TaskScheduler(self)
+        return self._task_scheduler
+
+    def _create_http_session(self):
+        """
+        Create an HTTP session with a pool of keep-alive connections.
+
+        Connections are reused between API requests, which saves a TCP (and
+        TLS) handshake for every request to the same server.
+        """
+        http = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.config.HTTP_POOL_CONNECTIONS,
+            pool_maxsize=self.config.HTTP_POOL_MAXSIZE,
+            pool_block=self.config.HTTP_POOL_BLOCK)
+        http.mount('http://', adapter)
+        http.mount('https://', adapter)
+        return http
+
+    def _create_http_cache(self):
+        """
+        Create a cache for API responses as configured by
+        :attr:`~manwe.default_config.HTTP_CACHE`, or `None` if responses
+        should not be cached.
+        """
+        if not self.config.HTTP_CACHE:
+            return None
+        if self.config.HTTP_CACHE == 'memory':
+            return ResponseCache(self.config.HTTP_CACHE_SIZE)
+        if self.config.HTTP_CACHE == 'disk':
+            if not self.config.HTTP_CACHE_DIR:
+                raise ValueError('HTTP_CACHE_DIR must be set for the on-disk '
+                                 'HTTP cache')
+            return DiskResponseCache(self.config.HTTP_CACHE_DIR,
+                                     self.config.HTTP_CACHE_SIZE)
+        raise ValueError('Unknown HTTP cache: %s' % self.config.HTTP_CACHE)
 
     def set_log_level(self, log_level):
         """
@@ -154,26 +371,138 @@ class AbstractSession(object):
         """
         logger.setLevel(log_level)
 
-    def _lookup_endpoints(self):
+    @property
+    def endpoints(self):
         """
         Dictionary mapping API endpoints to their URIs.
+
+        The endpoints are discovered from the API root when first needed,
+        unless they are found in the endpoint cache (see
+        :attr:`~manwe.default_config.ENDPOINT_CACHE`).
+        """
+        if self._endpoints is None:
+            self._endpoints = self._discover_endpoints()
+        return self._endpoints
+
+    @endpoints.setter
+    def endpoints(self, endpoints):
+        self._endpoints = endpoints
+        self._endpoints_cached = False
+
+    def _endpoint_keys(self):
+        """
+        Names of the API endpoints we use.
         """
-        # TODO: Is API root actually a singleton resource and should we
-        #   model it as such and query it as such?
         keys = {key + '_collection' for key in self._collections}
         keys.add('authentication')
         keys.add('genome')
-        response = self.get(self.config.API_ROOT).json()
+        return keys
+
+    def _discover_endpoints(self, refresh=False):
+        """
+        Get the endpoints from the endpoint cache or, if they are not cached
+        or `refresh` is `True`, from the API root.
+        """
+        key = ' '.join([self.config.API_ROOT, ACCEPT_VERSION])
+
+        if self._endpoint_cache is not None and not refresh:
+            endpoints = self._endpoint_cache.get(key)
+            # Endpoints cached by another version might be incomplete.
+            if endpoints and self._endpoint_keys().issubset(endpoints):
+                self._endpoints_cached = True
+                return endpoints
+
+        endpoints = self._lookup_endpoints()
+        self._endpoints_cached = False
+
+        if self._endpoint_cache is not None:
+            try:
+                self._endpoint_cache.set(key, endpoints)
+            except EnvironmentError as e:
+                logger.warn('Unable to write endpoint cache: %s', e)
+        return endpoints
+
+    def _stale_endpoint(self, uri):
+        """
+        If `uri` is the URI of a cached endpoint, return the endpoint name.
+        Otherwise, return `None`.
+        """
+        if self._endpoints is None or not self._endpoints_cached:
+            return None
+        uri = self._qualified_uri(uri)
+        for key, endpoint_uri in self._endpoints.items():
+            if self._qualified_uri(endpoint_uri) == uri:
+                return key
+        return None
+
+    def _lookup_endpoints(self):
+        """
+        Dictionary mapping API endpoints to their URIs.
+        """
+        # TODO: Is API root actually a singleton resource and should we
+        #   model it as such and query it as such?
+        keys = self._endpoint_keys()
+        response = self.decode(self.get(self.config.API_ROOT))
         return {key: response['root'][key]['uri'] for key in keys}
 
     def _qualified_uri(self, uri):
         return urlparse.urljoin(self.config.API_ROOT, uri)
 
-    def get(self, *args, **kwargs):
+    def get(self, uri, **kwargs):
         """
         Short for :meth:`request` where `method` is ``GET``.
+
+        Concurrent identical requests (same URI, data, headers, and token)
+        share a single HTTP request and all get its response (unless
+        :attr:`~manwe.default_config.COALESCE_REQUESTS` is `False` or the
+        response is streamed).
+
+        Requests are never shared across writes: a request made after any
+        other request (e.g., ``POST`` or ``PATCH``) was started does not
+        share a request that was in flight before, since its response might
+        not reflect the write.
+        """
+        if not self.config.COALESCE_REQUESTS or kwargs.get('stream'):
+            return self.request('GET', uri, **kwargs)
+
+        key = (self._qualified_uri(uri), self.config.TOKEN,
+               json.dumps(kwargs, sort_keys=True, default=repr))
+
+        with self._requests_in_flight_lock:
+            future = self._requests_in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = concurrent.futures.Future()
+                self._requests_in_flight[key] = future
+            else:
+                self.coalesced_requests += 1
+        if not leader:
+            return future.result()
+
+        try:
+            response = self.request('GET', uri, **kwargs)
+        except BaseException as e:
+            self._forget_request_in_flight(key, future)
+            future.set_exception(e)
+            raise
+        self._forget_request_in_flight(key, future)
+        future.set_result(response)
+        return response
+
+    def _forget_request_in_flight(self, key, future):
+        """
+        Stop sharing a ``GET`` request (unless it was already forgotten).
+        """
+        with self._requests_in_flight_lock:
+            if self._requests_in_flight.get(key) is future:
+                del self._requests_in_flight[key]
+
+    def _forget_requests_in_flight(self):
+        """
+        Stop sharing all ``GET`` requests in flight.
         """
-        return self.request('GET', *args, **kwargs)
+        with self._requests_in_flight_lock:
+            self._requests_in_flight.clear()
 
     def post(self, *args, **kwargs):
         """
@@ -191,10 +520,47 @@ class AbstractSession(object):
         """
         Send HTTP request to server.
 
+        If `uri` is the URI of an endpoint read from the endpoint cache and
+        the server responds with ``404 Not Found``, the endpoints are
+        discovered again and the request is retried with the new URI.
+
+        If the HTTP cache is enabled (see
+        :attr:`~manwe.default_config.HTTP_CACHE`), ``GET`` responses with an
+        `ETag` or `Last-Modified` header are stored. Subsequent identical
+        requests are made conditional, and if the server responds with
+        ``304 Not Modified``, the stored response is returned.
+
         :raises requests.RequestException: Exception occurred while handling
             an API request.
         """
-        headers = kwargs.pop('headers', {})
+        if method != 'GET':
+            # Responses to requests in flight might not reflect this write,
+            # so they should not be shared with later requests (see `get`).
+            self._forget_requests_in_flight()
+            try:
+                return self._request_endpoint(method, uri, **kwargs)
+            finally:
+                self._forget_requests_in_flight()
+        return self._request_endpoint(method, uri, **kwargs)
+
+    def _request_endpoint(self, method, uri, **kwargs):
+        """
+        Send HTTP request to server, discovering the endpoints again if the
+        URI is of a stale endpoint.
+        """
+        try:
+            return self._request(method, uri, **kwargs)
+        except NotFoundError:
+            # File handles have been read, we cannot retry.
+            key = None if 'files' in kwargs else self._stale_endpoint(uri)
+            if key is None:
+                raise
+        logger.info('Endpoint not found, discovering endpoints: %s', uri)
+        self._endpoints = self._discover_endpoints(refresh=True)
+        return self._request(method, self._endpoints[key], **kwargs)
+
+    def _request(self, method, uri, **kwargs):
+        headers = dict(kwargs.pop('headers', None) or {})
         uri = self._qualified_uri(uri)
         if 'files' in kwargs:
             # If the `files` keyword argument is set, we don't encode the
@@ -207,6 +573,7 @@ class AbstractSession(object):
             # the entire files in memory. The requests toolbelt library allows
             # us to stream such requests.
             # https://github.com/sigmavirus24/requests-toolbelt
+            from requests_toolbelt.multipart.encoder import MultipartEncoder
             def get_filename(handle, default=None):
                 if not hasattr(handle, 'name') or handle.name.startswith('<'):
                     return default
@@ -219,29 +586,81 @@ class AbstractSession(object):
             kwargs['data'] = encoder
             headers['Content-Type'] = encoder.content_type
         elif 'data' in kwargs:
-            kwargs['data'] = json.dumps(kwargs['data'])
+            kwargs['data'] = self.codec.dumps(kwargs['data'])
             headers['Content-Type'] = 'application/json'
         headers['Accept-Version'] = ACCEPT_VERSION
         #kwargs['auth'] = self.config.USER, self.config.PASSWORD
         if self.config.TOKEN:
             headers['Authorization'] = 'Token ' + self.config.TOKEN
+        cache_key = cached = None
+        if (method == 'GET' and self._http_cache is not None and
+                not kwargs.get('stream')):
+            cache_key = '\n'.join([uri, kwargs.get('data') or '',
+                                   headers.get('Range', ''),
+                                   headers['Accept-Version'],
+                                   headers.get('Authorization', '')])
+            cached = self._http_cache.get(cache_key)
+            if cached is not None:
+                validators = requests.structures.CaseInsensitiveDict(
+                    cached.headers)
+                if 'ETag' in validators:
+                    headers['If-None-Match'] = validators['ETag']
+                if 'Last-Modified' in validators:
+                    headers['If-Modified-Since'] = validators['Last-Modified']
         try:
-            response = requests.request(
+            response = self._http.request(
                 method, uri, headers=headers,
                 verify=self.config.VERIFY_CERTIFICATE, **kwargs)
         except requests.RequestException as e:
             logger.warn('Unable to make API request', method, uri)
             raise
+        if response.status_code == 304 and cached is not None:
+            logger.debug('Not modified API response: %s %s', method, uri)
+            return self._cached_response(cached)
         if response.status_code in (200, 201, 202, 206):
             logger.debug('Successful API response', method, uri,
                          response.status_code)
+            if cache_key is not None:
+                self._cache_response(cache_key, response)
             return response
         logger.warn('Error API response', method, uri, response.status_code)
         self._response_error(response)
 
+    def _cache_response(self, key, response):
+        """
+        Store a response in the HTTP cache if it can be revalidated.
+        """
+        if ('ETag' in response.headers or
+                'Last-Modified' in response.headers):
+            self._http_cache.set(key, CachedResponse(
+                response.url, response.status_code, dict(response.headers),
+                response.content))
+        else:
+            self._http_cache.remove(key)
+
+    def _cached_response(self, cached):
+        """
+        Create a response object from a response in the HTTP cache.
+        """
+        response = requests.Response()
+        response.url = cached.url
+        response.status_code = cached.status_code
+        response.headers = requests.structures.CaseInsensitiveDict(
+            cached.headers)
+        response._content = cached.content
+        return response
+
+    def decode(self, response):
+        """
+        Decode the JSON body of an API response using :attr:`codec`.
+
+        :raises ValueError: The response body is not valid JSON.
+        """
+        return self.codec.loads(response.content)
+
     def _response_error(self, response):
         try:
-            content = response.json()
+            content = self.decode(response)
             code = content['error']['code']
             message = content['error']['message']
         except (KeyError, ValueError):
@@ -253,10 +672,200 @@ class AbstractSession(object):
         #     instead of a 1:1 mapping from status codes.
         raise self._api_errors[response.status_code](code, message)
 
-    def _get_resource(self, key, uri):
-        response = self.get(uri)
-        return self._collections[key].resource_class(self,
-                                                     response.json()[key])
+    def invalidate(self, uri):
+        """
+        Remove the resource with `uri` from the resource cache, so it is
+        retrieved from the server on next access.
+
+        :arg str uri: URI for the resource.
+        """
+        self._resource_cache.remove(self._qualified_uri(uri))
+
+    def clear_cache(self):
+        """
+        Remove all resources from the resource cache.
+        """
+        self._resource_cache.clear()
+
+    def prefetch(self, resources, *fields):
+        """
+        Retrieve resources and the resources they link to concurrently.
+
+        Resources that are not loaded yet and the resources linked by the
+        link fields `fields` on them are de-duplicated by URI and retrieved
+        concurrently on the :attr:`fanout_executor` thread pool (so this can
+        be called from code running on :attr:`executor`). Accessing these
+        resources afterwards does not trigger any requests (as long as they
+        stay in the resource cache).
+
+        Example::
+
+            >>> samples = session.prefetch(session.samples(), 'user', 'groups')
+
+        :arg resources: Resources to prefetch linked resources for.
+        :type resources: iterable(:class:`.Resource`)
+        :arg fields: Names of link fields (or sets of links) to prefetch.
+        :type fields: str
+
+        :return: The resources.
+        :rtype: list(:class:`.Resource`)
+
+        :raises ValueError: If `fields` contains a name that is not a link
+          field (or set of links) of the resources.
+        """
+        resources = list(resources)
+        for resource_class in set(type(resource) for resource in resources):
+            self._check_link_fields(resource_class, fields)
+        self._load_resources(resources)
+
+        linked = []
+        for resource in resources:
+            for name in fields:
+                value = getattr(resource, name)
+                if value is None:
+                    continue
+                if isinstance(value, frozenset):
+                    linked.extend(value)
+                else:
+                    linked.append(value)
+        self._load_resources(linked)
+
+        return resources
+
+    def _check_link_fields(self, resource_class, fields):
+        """
+        Check that `fields` are names of link fields (or sets of links) of
+        `resource_class`.
+
+        :raises ValueError: If `fields` contains another name.
+        """
+        links = set(field.name for field in resource_class._fields
+                    if isinstance(field, Link) or
+                    (isinstance(field, Set) and isinstance(field.field, Link)))
+        invalid = [name for name in fields if name not in links]
+        if invalid:
+            raise ValueError('Not link fields of %s: %s'
+                             % (resource_class.key, ', '.join(invalid)))
+
+    def _load_resources(self, resources):
+        """
+        Concurrently retrieve the resources that are not loaded yet (skipping
+        dirty field values).
+        """
+        unloaded = {}
+        for resource in resources:
+            if not resource.loaded:
+                unloaded.setdefault(self._qualified_uri(resource.uri),
+                                    resource)
+        for _ in self.fanout_executor.map(
+                lambda r: r.refresh(skip_dirty=True), unloaded.values()):
+            pass
+
+    def _cache_resource(self, resource):
+        """
+        Store `resource` in the resource cache, or renew it if it is already
+        stored.
+
+        This should be called whenever the resource is loaded with data from
+        the server.
+        """
+        self._resource_cache.set(self._qualified_uri(resource.uri), resource)
+
+    def _resource_from_values(self, key, values):
+        """
+        Get a resource of type `key` from its API representation.
+
+        If the resource is already in the resource cache, the cached instance
+        is updated with the new field values (skipping dirty fields) and
+        returned.
+        """
+        try:
+            resource, _ = self._resource_cache.get(
+                self._qualified_uri(values['uri']))
+        except KeyError:
+            resource = self._collections[key].resource_class(self, values)
+        else:
+            resource._load_values(values, skip_dirty=True)
+        self._cache_resource(resource)
+        return resource
+
+    def _embedded_resource(self, key, values):
+        """
+        Get a resource of type `key` from its API representation embedded in
+        another resource.
+
+        The embedded representation is only used if the resource is not
+        already in the resource cache, since the cached instance might have
+        been loaded more recently.
+        """
+        try:
+            resource, expired = self._resource_cache.get(
+                self._qualified_uri(values['uri']))
+        except KeyError:
+            pass
+        else:
+            if resource.loaded and not expired:
+                return resource
+        return self._resource_from_values(key, values)
+
+    def _get_embedded(self, key, uri, embed=None, **kwargs):
+        """
+        Short for :meth:`get` where the server is asked to embed the
+        resources linked by the fields in `embed` (using Python names) in the
+        representation of a resource of type `key`.
+
+        If the server rejects the `embed` argument, we fall back to a request
+        without embedding (and remember not to try this again). Other
+        errors are raised.
+
+        :raises ValueError: If `embed` contains an unknown field name.
+        """
+        embed = tuple(sorted(embed or ()))
+        if embed and (key, embed) not in self._unsupported_embeds:
+            resource_class = self._collections[key].resource_class
+            fields = {field.name: field for field in resource_class._fields}
+            unknown = [name for name in embed if name not in fields]
+            if unknown:
+                raise ValueError('Unknown fields to embed in %s: %s'
+                                 % (key, ', '.join(unknown)))
+            data = dict(kwargs.get('data') or {})
+            data['embed'] = [fields[name].key for name in embed]
+            try:
+                return self.get(uri, **dict(kwargs, data=data))
+            except BadRequestError as e:
+                # Servers without support for embedding reject the unknown
+                # `embed` argument. A bad request for another reason will
+                # fail again below.
+                if 'embed' not in unicode(e.message or ''):
+                    raise
+                response = self.get(uri, **kwargs)
+                logger.info('Embedding %s in %s not supported by server',
+                            ', '.join(embed), key)
+                self._unsupported_embeds.add((key, embed))
+                return response
+        return self.get(uri, **kwargs)
+
+    def _get_resource(self, key, uri, lazy=False, embed=None):
+        # We return the same resource instance for the same URI (as long as
+        # it is in the cache), which saves requests and makes sure changes
+        # are visible everywhere. Expired instances are refreshed in place.
+        try:
+            resource, expired = self._resource_cache.get(
+                self._qualified_uri(uri))
+        except KeyError:
+            resource, expired = None, True
+        if lazy:
+            if resource is None:
+                resource = self._collections[key].resource_class(
+                    self, {'uri': uri}, lazy=True)
+                self._cache_resource(resource)
+            elif expired:
+                resource.expire()
+            return resource
+        if resource is not None and resource.loaded and not expired:
+            return resource
+        response = self._get_embedded(key, uri, embed=embed)
+        return self._resource_from_values(key, self.decode(response)[key])
 
     def _get_collection(self, key, *args, **kwargs):
         return self._collections[key](self, *args, **kwargs)
@@ -293,3 +902,99 @@ class Session(AbstractSession):
                                        resources.UserCollection,
                                        resources.VariantCollection,
                                        resources.VariationCollection)}
+
+
+class AsyncSession(object):
+    """
+    Session for interfacing the server API concurrently.
+
+    This wraps a :class:`Session` and has the same API call methods, but
+    instead of blocking they immediately return a
+    :class:`concurrent.futures.Future`. Requests are run on the
+    :attr:`Session.executor` thread pool of the wrapped session.
+
+    Resources produced by these futures are attached to the wrapped session,
+    so their methods (and those of collections) are blocking. Use
+    :meth:`submit` to run them concurrently.
+
+    Example session::
+
+        >>> session = AsyncSession()
+        >>> futures = [session.sample(uri) for uri in uris]
+        >>> samples = [future.result() for future in futures]
+        >>> annotations = [session.annotate(variant) for variant in variants]
+        >>> session.wait(session.create_annotation(data_source).result().task)
+    """
+    __metaclass__ = SessionMeta
+    _collections = Session._collections
+
+    def __init__(self, session=None, **kwargs):
+        """
+        Create an asynchronous session.
+
+        :arg session: Session to wrap. If `None`, a new session is created
+          using the keyword arguments.
+        :type session: :class:`Session`
+        """
+        #: The wrapped session as :class:`.Session <Session>`.
+        self.session = session or Session(**kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Close the wrapped session (see :meth:`Session.close`).
+        """
+        self.session.close()
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Schedule `function` to be called with the given arguments.
+
+        :return: Future for the result of the function call.
+        :rtype: concurrent.futures.Future
+        """
+        return self.session.executor.submit(function, *args, **kwargs)
+
+    def wait(self, task):
+        """
+        Wait for a task to complete (see :meth:`.Task.as_future`).
+
+        Instead of occupying a worker thread, the task is polled by the
+        shared background poller of the wrapped session.
+
+        :arg task: Task to wait for.
+        :type task: :class:`.Task`
+
+        :return: Future that is done when the task is done.
+        :rtype: concurrent.futures.Future
+        """
+        return task.as_future()
+
+    def annotate(self, variant, queries=None):
+        """
+        Annotate a variant (see :meth:`.Variant.annotate`).
+
+        :arg variant: Variant to annotate.
+        :type variant: :class:`.Variant`
+
+        :return: Future for the variant observation frequencies.
+        :rtype: concurrent.futures.Future
+        """
+        return self.submit(variant.annotate, queries=queries)
+
+    def _get_resource(self, key, uri, lazy=False, embed=None):
+        return self.submit(self.session._get_resource, key, uri, lazy=lazy,
+                           embed=embed)
+
+    def _get_collection(self, key, *args, **kwargs):
+        return self.submit(self.session._get_collection, key, *args,
+                           **kwargs)
+
+    def _create_resource(self, key, *args, **kwargs):
+        return self.submit(self.session._create_resource, key, *args,
+                           **kwargs)
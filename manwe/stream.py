@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Manwë incremental JSON parsing.
+
+Used to decode resource representations from a collection response while it
+is being received, instead of reading and parsing the complete response
+first.
+
+.. moduleauthor:: Martijn Vermaat <martijn@vermaat.name>
+
+.. Licensed under the MIT license, see the LICENSE file.
+"""
+
+
+import codecs
+import json
+import re
+
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+NUMBER_START = frozenset('-0123456789')
+NUMBER_PART = re.compile(r'[0-9.eE+-]*')
+
+
+class Reader(object):
+    """
+    Buffered reader of JSON text from an iterator over chunks of UTF-8
+    encoded data.
+
+    Only the part of the text that has not been consumed yet is kept in
+    memory.
+    """
+    def __init__(self, chunks, decoder=None):
+        """
+        :arg chunks: Chunks of UTF-8 encoded JSON text.
+        :type chunks: iterator(bytes)
+        :arg decoder: JSON decoder used to decode values (must implement
+          `raw_decode`).
+        :type decoder: json.JSONDecoder
+        """
+        self._chunks = iter(chunks)
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._decoder = decoder or json.JSONDecoder()
+        self._buffer = u''
+        self._position = 0
+        self._finished = False
+
+    def _fill(self):
+        """
+        Read more text into the buffer.
+
+        :return: `False` if there is no more text, `True` otherwise.
+        """
+        while not self._finished:
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                self._finished = True
+                text = self._text_decoder.decode(b'', True)
+            else:
+                text = self._text_decoder.decode(chunk)
+            if text:
+                self._buffer = self._buffer[self._position:] + text
+                self._position = 0
+                return True
+        return False
+
+    def peek(self):
+        """
+        Skip whitespace and return the next character.
+
+        :raises ValueError: If there is no more text.
+        """
+        while True:
+            self._position = WHITESPACE.match(self._buffer,
+                                              self._position).end()
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._fill():
+                raise ValueError('Unexpected end of JSON data')
+
+    def expect(self, character):
+        """
+        Skip whitespace and consume `character`.
+
+        :raises ValueError: If the next character is not `character`.
+        """
+        if self.peek() != character:
+            raise ValueError('Expecting %r in JSON data at: %r' % (
+                character, self._buffer[self._position:][:20]))
+        self._position += 1
+
+    def decode(self):
+        """
+        Skip whitespace and decode the next JSON value.
+
+        :raises ValueError: If there is no valid JSON value.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer,
+                                                      self._position)
+            except ValueError:
+                # The value might be incomplete.
+                if not self._fill():
+                    raise
+                continue
+            # A number followed by nothing but number characters might be
+            # truncated (e.g., `12` from `12.5` or `1` from `1e5`), so we
+            # only accept it if another character follows.
+            if (self._buffer[self._position] in NUMBER_START and
+                    NUMBER_PART.match(self._buffer, end).end() ==
+                    len(self._buffer) and self._fill()):
+                continue
+            self._position = end
+            return value
+
+
+def iter_array(chunks, path, decoder=None):
+    """
+    Iterate over the values of an array in a JSON document as they are
+    received.
+
+    Example::
+
+        >>> chunks = ['{"sample_collection": {"it', 'ems": [1, 2, ', '3]}}']
+        >>> list(iter_array(chunks, ['sample_collection', 'items']))
+        [1, 2, 3]
+
+    :arg chunks: Chunks of UTF-8 encoded JSON text.
+    :type chunks: iterator(bytes)
+    :arg path: Keys of the nested objects leading to the array.
+    :type path: list(str)
+    :arg decoder: JSON decoder used to decode values (must implement
+      `raw_decode`).
+    :type decoder: json.JSONDecoder
+
+    :raises ValueError: If the JSON document is invalid or does not contain
+      an array at `path`.
+    """
+    reader = Reader(chunks, decoder=decoder)
+
+    for key in path:
+        reader.expect('{')
+        while True:
+            if reader.peek() == '}':
+                raise ValueError('Key not found in JSON data: %s' % key)
+            name = reader.decode()
+            reader.expect(':')
+            if name == key:
+                break
+            # Skip the value for this key.
+            reader.decode()
+            if reader.peek() == ',':
+                reader.expect(',')
+
+    reader.expect('[')
+    if reader.peek() == ']':
+        return
+    while True:
+        yield reader.decode()
+        if reader.peek() == ']':
+            return
+        reader.expect(',')
@@ -0,0 +1,424 @@
+# -*- coding: utf-8 -*-
+"""
+Manwë workflows.
+
+Import, annotate, and download a batch of VCF files as a pipeline, instead of
+running these stages strictly in order for one file at a time.
+
+.. moduleauthor:: Martijn Vermaat <martijn@vermaat.name>
+
+.. Licensed under the MIT license, see the LICENSE file.
+"""
+
+
+import collections
+import errno
+import json
+import logging
+import os
+import Queue
+import tempfile
+import threading
+
+import concurrent.futures
+
+
+logger = logging.getLogger('manwe.workflow')
+
+
+#: Workflow stages, in order.
+STAGES = ('upload', 'variation', 'annotation', 'download')
+
+
+class Job(object):
+    """
+    Workflow job for one VCF file.
+    """
+    def __init__(self, vcf_file, sample=None, output=None, state=None):
+        """
+        Create a job.
+
+        :arg str vcf_file: Path to the VCF file.
+        :arg str sample: URI of the sample to import the variation into, or
+          `None` to skip the ``variation`` stage.
+        :arg str output: Path to write the annotated VCF file to. By default,
+          this is derived from `vcf_file`.
+        :arg dict state: Saved state of the stages.
+        """
+        #: Path to the VCF file.
+        self.vcf_file = vcf_file
+
+        #: URI of the sample to import the variation into.
+        self.sample = sample
+
+        #: Path to write the annotated VCF file to.
+        self.output = output
+
+        #: State of the stages as a dictionary by stage name. Every stage
+        #: state is a dictionary with a `finished` flag and the stage results
+        #: (e.g., a `uri` of the created resource).
+        self.state = state or {}
+
+        #: Exception raised by a failed stage, or `None`.
+        self.error = None
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, self.vcf_file)
+
+    @property
+    def stages(self):
+        """
+        Stages of this job, in order.
+        """
+        return [stage for stage in STAGES
+                if stage != 'variation' or self.sample is not None]
+
+    @property
+    def stage(self):
+        """
+        The next stage to run, or `None` if all stages are finished.
+        """
+        for stage in self.stages:
+            if not self.state.get(stage, {}).get('finished'):
+                return stage
+        return None
+
+    @property
+    def finished(self):
+        """
+        `True` if all stages are finished.
+        """
+        return self.stage is None
+
+    def get(self, stage, name):
+        """
+        Result `name` of `stage`, or `None` if there is no such result.
+        """
+        return self.state.get(stage, {}).get(name)
+
+
+class Workflow(object):
+    """
+    Pipeline importing, annotating, and downloading a batch of VCF files.
+
+    Every file is handled by a :class:`Job`, running the following stages
+    (see :data:`STAGES`):
+
+    1. ``upload``: Create a data source for the file.
+    2. ``variation``: Import the data source into a sample and wait for the
+       task (skipped if the job has no sample).
+    3. ``annotation``: Annotate the data source and wait for the task.
+    4. ``download``: Write the annotated data source to the output file.
+
+    Different jobs run their stages concurrently, limited per stage by
+    :attr:`concurrency`. So the upload of one file overlaps with the server
+    processing another, and every download starts as soon as its annotation
+    is finished. Stage requests run on the :attr:`.Session.executor` thread
+    pool, and tasks are waited for with :meth:`.Task.as_future` without
+    occupying a worker thread.
+
+    The state of all jobs is written to a state file after every stage, and
+    created resources are recorded as soon as they exist. Running a workflow
+    again with the same state file skips finished stages and continues
+    waiting for tasks that were started. Saved jobs are identified by their
+    VCF file and options, so running a file with other options (e.g., other
+    `queries`) starts a new job.
+
+    Example::
+
+        >>> workflow = Workflow(session, state_file='nightly.json')
+        >>> for vcf_file, sample in batch:
+        ...     workflow.add(vcf_file, sample=sample)
+        >>> failed = workflow.run()
+    """
+    def __init__(self, session, state_file=None, concurrency=None,
+                 queries=None, data_uploaded=False,
+                 prefer_genotype_likelihoods=False):
+        """
+        Create a workflow.
+
+        :arg session: Manwë session.
+        :type session: :class:`.Session`
+        :arg str state_file: Path to the state file. If `None`, the workflow
+          state is not saved.
+        :arg concurrency: Maximum number of jobs running a stage at the same
+          time, by stage name. For the ``variation`` and ``annotation``
+          stages, this includes waiting for the task. Missing stages default
+          to :attr:`~manwe.default_config.WORKFLOW_CONCURRENCY`.
+        :type concurrency: dict(str, int)
+        :arg queries: Sample queries to calculate variant frequencies over
+          (see :meth:`.Annotation.create`).
+        :type queries: dict(str, str)
+        :arg bool data_uploaded: If `True`, VCF files are paths on the server
+          filesystem instead of being uploaded.
+        :arg bool prefer_genotype_likelihoods: Prefer using genotype
+          likelihoods when importing variations.
+        """
+        #: The session this workflow is attached to as
+        #: :class:`.Session <Session>`.
+        self.session = session
+
+        #: Path to the state file.
+        self.state_file = state_file
+
+        #: Maximum number of jobs running a stage at the same time, by stage
+        #: name.
+        self.concurrency = dict(session.config.WORKFLOW_CONCURRENCY,
+                                **(concurrency or {}))
+
+        self.queries = queries or {}
+        self.data_uploaded = data_uploaded
+        self.prefer_genotype_likelihoods = prefer_genotype_likelihoods
+
+        #: List of jobs as :class:`Job` instances.
+        self.jobs = []
+
+        self._lock = threading.Lock()
+        self._saved = self._load()
+
+    def add(self, vcf_file, sample=None, output=None):
+        """
+        Add a job for a VCF file.
+
+        If the state file has a job for the same VCF file with the same
+        options (sample, output path, and the workflow options that affect
+        the result), its state is restored.
+
+        :arg str vcf_file: Path to the VCF file.
+        :arg sample: Sample (or its URI) to import the variation into. If
+          `None`, the variation is not imported.
+        :type sample: :class:`.Sample` or str
+        :arg str output: Path to write the annotated VCF file to. By default,
+          this is derived from `vcf_file`.
+
+        :return: The job.
+        :rtype: :class:`Job`
+        """
+        sample = getattr(sample, 'uri', sample)
+
+        job = Job(vcf_file, sample=sample, output=output)
+        saved = self._saved.get(self._key(job))
+        if saved is not None:
+            job.state = saved['stages']
+        self.jobs.append(job)
+        return job
+
+    def _options(self, job):
+        """
+        Options the result of a job depends on.
+        """
+        return {'sample': job.sample,
+                'output': job.output,
+                'queries': self.queries,
+                'data_uploaded': self.data_uploaded,
+                'prefer_genotype_likelihoods':
+                    self.prefer_genotype_likelihoods}
+
+    def _key(self, job):
+        """
+        Key identifying the saved state of a job.
+        """
+        return json.dumps([job.vcf_file, self._options(job)], sort_keys=True)
+
+    def run(self):
+        """
+        Run all unfinished jobs until every job is finished or failed.
+
+        A failed stage does not stop the other jobs. Its error is logged and
+        stored as :attr:`Job.error`, and the stage is retried when the
+        workflow is run again.
+
+        :return: Failed jobs.
+        :rtype: list(:class:`Job`)
+        """
+        workers = {'upload': self._upload,
+                   'variation': self._variation,
+                   'annotation': self._annotation,
+                   'download': self._download}
+        events = Queue.Queue()
+        running = collections.Counter()
+        active = set()
+
+        def notify(job, stage):
+            return lambda future: events.put((job, stage, future))
+
+        for job in self.jobs:
+            job.error = None
+
+        while True:
+            for job in self.jobs:
+                stage = job.stage
+                if (stage is None or job.error is not None or job in active or
+                        running[stage] >= self.concurrency.get(stage, 1)):
+                    continue
+                logger.info('Starting %s stage: %s', stage, job.vcf_file)
+                running[stage] += 1
+                active.add(job)
+                future = self.session.executor.submit(workers[stage], job)
+                future.add_done_callback(notify(job, stage))
+
+            if not active:
+                break
+
+            job, stage, future = self._next_event(events)
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.warn('Failed %s stage: %s: %s', stage, job.vcf_file, e)
+                job.error = e
+            else:
+                if isinstance(result, concurrent.futures.Future):
+                    # The stage started a server task, wait for it without
+                    # occupying a worker thread.
+                    result.add_done_callback(notify(job, stage))
+                    continue
+                logger.info('Finished %s stage: %s', stage, job.vcf_file)
+                self._update(job, stage, finished=True,
+                             **(result if isinstance(result, dict) else {}))
+            running[stage] -= 1
+            active.remove(job)
+
+        return [job for job in self.jobs if job.error is not None]
+
+    def _next_event(self, events):
+        """
+        Get the next finished future from the event queue.
+        """
+        # Without a timeout, `Queue.get` cannot be interrupted (e.g., by
+        # pressing Ctrl-C).
+        while True:
+            try:
+                return events.get(True, 1)
+            except Queue.Empty:
+                pass
+
+    def _upload(self, job):
+        """
+        Create a data source for the VCF file.
+        """
+        name = 'Variants from file "%s"' % job.vcf_file
+        gzipped = job.vcf_file.endswith('.gz')
+        if self.data_uploaded:
+            data_source = self.session.create_data_source(
+                name, filetype='vcf', gzipped=gzipped,
+                local_file=job.vcf_file)
+        else:
+            with open(job.vcf_file, 'rb') as data:
+                data_source = self.session.create_data_source(
+                    name, filetype='vcf', gzipped=gzipped, data=data)
+        return {'uri': data_source.uri}
+
+    def _variation(self, job):
+        """
+        Import the data source into the sample, returning a future for the
+        task.
+        """
+        uri = job.get('variation', 'uri')
+        if uri is None:
+            variation = self.session.create_variation(
+                self.session.sample(job.sample, lazy=True),
+                self.session.data_source(job.get('upload', 'uri'), lazy=True),
+                prefer_genotype_likelihoods=self.prefer_genotype_likelihoods)
+            self._update(job, 'variation', uri=variation.uri)
+        else:
+            variation = self._restore(self.session.variation(uri))
+        return variation.task.as_future()
+
+    def _annotation(self, job):
+        """
+        Annotate the data source, returning a future for the task.
+        """
+        uri = job.get('annotation', 'uri')
+        if uri is None:
+            annotation = self.session.create_annotation(
+                self.session.data_source(job.get('upload', 'uri'), lazy=True),
+                queries=self.queries)
+            self._update(job, 'annotation', uri=annotation.uri)
+        else:
+            annotation = self._restore(self.session.annotation(uri))
+        return annotation.task.as_future()
+
+    def _restore(self, resource):
+        """
+        Resubmit the task of a resource from a previous run if it failed.
+        """
+        if resource.task.failure:
+            logger.info('Resubmitting failed task: %s', resource.uri)
+            resource.task.resubmit()
+            resource.task.refresh()
+        return resource
+
+    def _download(self, job):
+        """
+        Write the annotated data source to the output file.
+        """
+        annotation = self.session.annotation(job.get('annotation', 'uri'))
+        data_source = annotation.annotated_data_source
+
+        output = job.output
+        if output is None:
+            base = job.vcf_file
+            for extension in ('.gz', '.vcf'):
+                if base.endswith(extension):
+                    base = base[:-len(extension)]
+            output = '%s.annotated.vcf%s' % (
+                base, '.gz' if data_source.gzipped else '')
+
+        # Write to a temporary file first, so we never leave a partially
+        # written output file.
+        handle, temporary = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(output)))
+        try:
+            with os.fdopen(handle, 'wb') as handle:
+                for chunk in data_source.data:
+                    handle.write(chunk)
+            os.rename(temporary, output)
+        except Exception:
+            os.remove(temporary)
+            raise
+        return {'path': output}
+
+    def _update(self, job, stage, **values):
+        """
+        Update the state of a job stage and save the workflow state.
+        """
+        with self._lock:
+            job.state.setdefault(stage, {}).update(values)
+            self._save()
+
+    def _load(self):
+        """
+        Read saved jobs from the state file, by key (see :meth:`_key`).
+        """
+        if self.state_file is None:
+            return {}
+        try:
+            with open(self.state_file) as handle:
+                jobs = json.load(handle).get('jobs', [])
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return {}
+        return {json.dumps([saved['vcf_file'], saved['options']],
+                           sort_keys=True): saved
+                for saved in jobs}
+
+    def _save(self):
+        """
+        Write the job states to the state file.
+        """
+        if self.state_file is None:
+            return
+        jobs = dict(self._saved)
+        for job in self.jobs:
+            jobs[self._key(job)] = {'vcf_file': job.vcf_file,
+                                    'options': self._options(job),
+                                    'stages': job.state}
+        # Write to a temporary file first, so an interrupted workflow never
+        # leaves a partially written state file.
+        handle, temporary = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(self.state_file)))
+        with os.fdopen(handle, 'w') as handle:
+            json.dump({'jobs': [jobs[key] for key in sorted(jobs)]}, handle,
+                      indent=2)
+        os.rename(temporary, self.state_file)
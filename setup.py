@@ -6,7 +6,11 @@ import sys
 if sys.version_info < (2, 7):
     raise Exception('Manwë requires Python 2.7 or higher.')
 
-install_requires = ['clint', 'python-dateutil', 'requests-toolbelt', 'Flask']
+install_requires = ['clint', 'python-dateutil', 'requests',
+                    'requests-toolbelt', 'Werkzeug']
+
+if sys.version_info < (3, 2):
+    install_requires.append('futures')
 
 try:
     with open('README.rst') as readme:
@@ -43,6 +47,9 @@ setup(
     platforms=['any'],
     packages=['manwe'],
     install_requires=install_requires,
+    extras_require={
+        'arrays': ['numpy']
+        },
     entry_points = {
         'console_scripts': ['manwe = manwe.commands:main']
         },
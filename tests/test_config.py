@@ -0,0 +1,63 @@
+"""
+Unit tests for :mod:`manwe.config`.
+"""
+
+
+import pytest
+
+from manwe import default_config
+from manwe.config import Config
+
+
+class TestConfig(object):
+    def test_defaults(self):
+        """
+        Configuration is initialized with the default values.
+        """
+        config = Config()
+        assert config.API_ROOT == default_config.API_ROOT
+        assert config['TASK_POLL_WAIT'] == default_config.TASK_POLL_WAIT
+
+    def test_from_pyfile(self, tmpdir):
+        """
+        Read configuration values from a Python file.
+        """
+        filename = tmpdir.join('config')
+        filename.write("API_ROOT = 'https://varda.example.com/'\n"
+                       "TOKEN = '123abc'\n"
+                       "lowercase = 'ignored'\n")
+
+        config = Config()
+        assert config.from_pyfile(str(filename))
+        assert config.API_ROOT == 'https://varda.example.com/'
+        assert config.TOKEN == '123abc'
+        assert 'lowercase' not in config
+
+    def test_from_pyfile_missing(self, tmpdir):
+        """
+        Read configuration values from a file that does not exist.
+        """
+        config = Config()
+        assert not config.from_pyfile(str(tmpdir.join('missing')),
+                                      silent=True)
+        with pytest.raises(IOError):
+            config.from_pyfile(str(tmpdir.join('missing')))
+
+    def test_from_object(self):
+        """
+        Read configuration values from an object by its import path.
+        """
+        config = Config()
+        config.API_ROOT = 'https://varda.example.com/'
+        config.from_object('manwe.default_config')
+        assert config.API_ROOT == default_config.API_ROOT
+
+    def test_attribute_access(self):
+        """
+        Configuration values are available as attributes.
+        """
+        config = Config()
+        config.TOKEN = '123abc'
+        assert config['TOKEN'] == '123abc'
+        with pytest.raises(AttributeError):
+            config.NONEXISTING
@@ -9,7 +9,8 @@ import pytest
 from varda import db
 from varda.models import Sample, User
 
-from manwe import resources
+from manwe import AsyncSession, resources
+from manwe.fields import Custom, Queries
 
 import utils
 
@@ -26,6 +27,23 @@ class TestAnnotation(object):
         annotation = resources.Annotation(None, values)
         assert annotation.uri == '/annotations/3'
 
+    def test_mutable_field_value(self):
+        """
+        Mutating a mutable field value does not change the resource.
+        """
+        class Thing(resources.Resource):
+            key = 'thing'
+            counts = Custom(lambda value, resource: dict(value),
+                            lambda value: value)
+
+        thing = Thing(None, dict(uri='/things/1', counts={'a': 1}))
+        counts = thing.counts
+        counts['b'] = 2
+        assert thing.counts == {'a': 1}
+        assert thing.counts is not thing.counts
+        assert not thing.dirty
+        assert not Queries.cacheable
+
 
 class TestCoverage(object):
     def test_read_coverage(self):
@@ -58,6 +76,21 @@ class TestDataSource(object):
         assert data_source.gzipped
         assert data_source.added == datetime.datetime(2012, 11, 23, 10, 55, 12)
 
+    def test_read_data_source_added(self):
+        """
+        Read timestamps from a data source.
+        """
+        values = dict(uri='/data_sources/4',
+                      added='2012-11-23T10:55:12.0342')
+        data_source = resources.DataSource(None, values)
+        assert data_source.added == datetime.datetime(2012, 11, 23, 10, 55, 12,
+                                                      34200)
+
+        values = dict(uri='/data_sources/4',
+                      added='2012-11-23 10:55')
+        data_source = resources.DataSource(None, values)
+        assert data_source.added == datetime.datetime(2012, 11, 23, 10, 55)
+
 
 class TestSample(object):
     def test_read_sample(self):
@@ -86,7 +119,7 @@ class TestSample(object):
         Read user from a sample.
         """
         class MockSession(object):
-            def user(self, uri):
+            def user(self, uri, lazy=False):
                 return 'mock user'
         s = MockSession()
 
@@ -212,6 +245,242 @@ class TestSampleCollection(utils.TestEnvironment):
         assert sample_list[0].name == 'test sample 2'
         assert sample_list[-1].name == 'test sample %i' % total
 
+    def test_sample_collection_read_ahead(self):
+        """
+        Iterate over the samples in a sample collection reading ahead.
+        """
+        # Total number of samples in our collection is 4 times the cache size
+        # plus 3.
+        total = self.session.config.COLLECTION_CACHE_SIZE * 4 + 3
+
+        user = User.query.first()
+        for i in range(total):
+            sample = Sample(user, 'test sample %d' % (i + 1))
+            db.session.add(sample)
+        db.session.commit()
+
+        samples = resources.SampleCollection(self.session)
+        samples.read_ahead = 2
+        sample_list = list(samples)
+        assert len(sample_list) == total
+        assert [sample.name for sample in sample_list] == [
+            'test sample %d' % (i + 1) for i in range(total)]
+
+    def test_sample_collection_read_ahead_async(self):
+        """
+        Iterate over the samples in a sample collection reading ahead from an
+        asynchronous session worker.
+        """
+        total = self.session.config.COLLECTION_CACHE_SIZE * 4 + 3
+
+        user = User.query.first()
+        for i in range(total):
+            sample = Sample(user, 'test sample %d' % (i + 1))
+            db.session.add(sample)
+        db.session.commit()
+
+        # With a single worker, reading ahead on the session executor would
+        # wait forever.
+        self.session.config.MAX_WORKERS = 1
+        async_session = AsyncSession(self.session)
+
+        samples = resources.SampleCollection(self.session)
+        samples.read_ahead = 2
+        sample_list = async_session.submit(list, samples).result(timeout=30)
+        assert [sample.name for sample in sample_list] == [
+            'test sample %d' % (i + 1) for i in range(total)]
+        async_session.close()
+
+    def test_sample_collection_fetch_all(self):
+        """
+        Retrieve all samples in a sample collection concurrently.
+        """
+        # Total number of samples in our collection is 4 times the cache size
+        # plus 3.
+        total = self.session.config.COLLECTION_CACHE_SIZE * 4 + 3
+
+        user = User.query.first()
+        for i in range(total):
+            sample = Sample(user, 'test sample %d' % (i + 1))
+            db.session.add(sample)
+        db.session.commit()
+
+        samples = resources.SampleCollection(self.session)
+        sample_list = samples.fetch_all(workers=2)
+        assert [sample.name for sample in sample_list] == [
+            'test sample %d' % (i + 1) for i in range(total)]
+        assert len(list(samples)) == 0
+
+    def test_sample_collection_fetch_all_async(self):
+        """
+        Retrieve all samples in a sample collection concurrently from an
+        asynchronous session worker.
+        """
+        total = self.session.config.COLLECTION_CACHE_SIZE * 4 + 3
+
+        user = User.query.first()
+        for i in range(total):
+            sample = Sample(user, 'test sample %d' % (i + 1))
+            db.session.add(sample)
+        db.session.commit()
+
+        self.session.config.MAX_WORKERS = 1
+        async_session = AsyncSession(self.session)
+
+        samples = resources.SampleCollection(self.session)
+        sample_list = async_session.submit(samples.fetch_all).result(
+            timeout=30)
+        assert [sample.name for sample in sample_list] == [
+            'test sample %d' % (i + 1) for i in range(total)]
+        async_session.close()
+
+    def test_sample_collection_adaptive(self):
+        """
+        Iterate over the samples in a sample collection with adaptive page
+        sizes.
+        """
+        # Total number of samples in our collection is 4 times the cache size
+        # plus 3.
+        total = self.session.config.COLLECTION_CACHE_SIZE * 4 + 3
+
+        user = User.query.first()
+        for i in range(total):
+            sample = Sample(user, 'test sample %d' % (i + 1))
+            db.session.add(sample)
+        db.session.commit()
+
+        self.session.config.COLLECTION_ADAPTIVE = True
+        self.session.config.COLLECTION_PAGE_TIME = 60
+        samples = resources.SampleCollection(self.session)
+        sample_list = list(samples)
+        assert [sample.name for sample in sample_list] == [
+            'test sample %d' % (i + 1) for i in range(total)]
+        assert samples.page_sizes[0].size == \
+            self.session.config.COLLECTION_CACHE_SIZE
+        assert samples.page_sizes[0].next_size == \
+            self.session.config.COLLECTION_CACHE_SIZE * 2
+
+        # Resetting the collection starts over from the configured size.
+        self.session.config.COLLECTION_CACHE_SIZE += 1
+        samples.reset()
+        assert samples.page_sizes[-1].size == \
+            self.session.config.COLLECTION_CACHE_SIZE
+
+    def test_sample_collection_stream(self):
+        """
+        Iterate over the samples in a sample collection decoding responses
+        while they are received.
+        """
+        # Total number of samples in our collection is 2 times the cache size
+        # plus 3.
+        total = self.session.config.COLLECTION_CACHE_SIZE * 2 + 3
+
+        user = User.query.first()
+        for i in range(total):
+            sample = Sample(user, 'test sample %d' % (i + 1))
+            db.session.add(sample)
+        db.session.commit()
+
+        self.session.config.COLLECTION_STREAM = True
+        samples = resources.SampleCollection(self.session)
+        assert samples.size == total
+        assert next(samples).name == 'test sample 1'
+        sample_list = list(samples)
+        assert [sample.name for sample in sample_list] == [
+            'test sample %d' % (i + 2) for i in range(total - 1)]
+
+        samples.reset()
+        assert next(samples).name == 'test sample 1'
+        assert len(samples.fetch_all()) == total - 1
+
+    def test_sample_collection_getitem(self):
+        """
+        Get samples by position in a sample collection.
+        """
+        # Total number of samples in our collection is 2 times the cache size
+        # plus 3.
+        total = self.session.config.COLLECTION_CACHE_SIZE * 2 + 3
+
+        user = User.query.first()
+        for i in range(total):
+            sample = Sample(user, 'test sample %d' % (i + 1))
+            db.session.add(sample)
+        db.session.commit()
+
+        samples = resources.SampleCollection(self.session)
+        assert samples.count() == total
+        assert samples[0].name == 'test sample 1'
+        assert samples[-1].name == 'test sample %d' % total
+        assert [sample.name for sample in samples[total - 5:total + 5:2]] == [
+            'test sample %d' % (total - 4), 'test sample %d' % (total - 2),
+            'test sample %d' % total]
+        with pytest.raises(IndexError):
+            samples[total]
+
+        requested = []
+        fetch_page = samples._fetch_page
+        def counting_fetch_page(start, stop, **kwargs):
+            requested.append((start, stop))
+            return fetch_page(start, stop, **kwargs)
+        samples._fetch_page = counting_fetch_page
+
+        # Slices with a small step retrieve the spanned range per page.
+        cache_size = samples.cache_size
+        assert [sample.name for sample in samples[0:total:2]] == [
+            'test sample %d' % (i + 1) for i in range(0, total, 2)]
+        last = max(range(0, total, 2)) + 1
+        assert requested == [(i, min(i + cache_size, last))
+                             for i in range(0, last, cache_size)]
+
+        # Slices with a large step only retrieve the selected positions.
+        del requested[:]
+        step = cache_size + 1
+        assert [sample.name for sample in samples[0:total:step]] == [
+            'test sample %d' % (i + 1) for i in range(0, total, step)]
+        assert sorted(requested) == [(i, i + 1)
+                                     for i in range(0, total, step)]
+        del samples._fetch_page
+
+        sample_list = list(samples)
+        assert len(sample_list) == total
+
+    def test_sample_collection_to_arrays(self):
+        """
+        Export a sample collection to arrays.
+        """
+        numpy = pytest.importorskip('numpy')
+
+        # Total number of samples in our collection is 2 times the cache size
+        # plus 3.
+        total = self.session.config.COLLECTION_CACHE_SIZE * 2 + 3
+
+        user = User.query.first()
+        for i in range(total):
+            sample = Sample(user, 'test sample %d' % (i + 1), pool_size=i)
+            db.session.add(sample)
+        db.session.commit()
+
+        samples = resources.SampleCollection(self.session)
+        arrays = samples.to_arrays(fields=['name', 'pool_size', 'user'],
+                                   categorical=['user'])
+        assert arrays['pool_size'].dtype == numpy.int64
+        assert list(arrays['pool_size']) == list(range(total))
+
+        offsets, data = arrays['name']
+        assert len(offsets) == total + 1
+        assert data[offsets[-2]:offsets[-1]].tostring() == \
+            'test sample %d' % total
+
+        codes, categories = arrays['user']
+        assert list(codes) == [0] * total
+        assert list(categories) == [self.uri_for_user()]
+
+        with pytest.raises(ValueError):
+            samples.to_arrays(fields=['groups'])
+
+        sample_list = list(samples)
+        assert len(sample_list) == total
+
     def test_sample_collection_user(self):
         """
         Request a sample collection for a user.
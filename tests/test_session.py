@@ -3,18 +3,80 @@ Unit tests for :mod:`manwe.session`.
 """
 
 
+import concurrent.futures
 import os
 import gzip
+import json
+import threading
+import time
 import zlib
 
 import pytest
+import requests
 import varda
 import varda.models
 import varda.tasks
+import werkzeug.wrappers
+
+from manwe import AsyncSession, Session
+from manwe.cache import CachedResponse, DiskResponseCache, ResponseCache
+from manwe.codec import Codec, get_codec
+from manwe.errors import BadRequestError
+from manwe.resources import TaskMonitor, TaskScheduler
+from manwe.session import ACCEPT_VERSION
 
 import utils
 
 
+class TestAsyncSession(object):
+    def test_get_resource(self):
+        """
+        Get a resource as a future.
+        """
+        class MockSession(object):
+            def __init__(self, executor):
+                self.executor = executor
+            def _get_resource(self, key, uri, **kwargs):
+                return key, uri
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            session = AsyncSession(MockSession(executor))
+            future = session.sample('/samples/3')
+            assert future.result() == ('sample', '/samples/3')
+
+
+class TestResponseCache(object):
+    def test_response_cache_eviction(self):
+        """
+        Evict least recently used responses from the cache.
+        """
+        cache = ResponseCache(100)
+        for i in range(3):
+            cache.set('/samples/%d' % i,
+                      CachedResponse('/samples/%d' % i, 200, {}, 'x' * 40))
+        assert len(cache) == 2
+        assert cache.bytes == 80
+        assert cache.get('/samples/0') is None
+        assert cache.get('/samples/2').content == 'x' * 40
+
+        cache.set('/samples/3', CachedResponse('/samples/3', 200, {},
+                                               'x' * 200))
+        assert cache.get('/samples/3') is None
+
+    def test_disk_response_cache(self, tmpdir):
+        """
+        Reuse an on-disk response cache.
+        """
+        cache = DiskResponseCache(str(tmpdir), 1024)
+        cache.set('/samples/1', CachedResponse(
+            '/samples/1', 200, {'ETag': '"abc"'}, '{"sample": {}}'))
+
+        cache = DiskResponseCache(str(tmpdir), 1024)
+        response = cache.get('/samples/1')
+        assert response.headers == {'ETag': '"abc"'}
+        assert response.content == '{"sample": {}}'
+
+
 class TestSession(utils.TestEnvironment):
     def test_get_user(self):
         """
@@ -154,6 +216,261 @@ class TestSession(utils.TestEnvironment):
         assert not task.failure
         assert task.error is None
 
+    def test_annotation_task_monitor(self):
+        """
+        Create annotations and monitor their tasks.
+        """
+        admin = varda.models.User.query.filter_by(name='Administrator').one()
+        for i in range(2):
+            varda.db.session.add(varda.models.DataSource(
+                admin, 'test data source %d' % i, 'vcf',
+                local_file='test.vcf.gz', gzipped=True))
+        varda.db.session.commit()
+
+        finished = []
+        monitor = TaskMonitor(self.session)
+        for i in range(2):
+            data_source_uri = self.uri_for_data_source(
+                name='test data source %d' % i)
+            data_source = self.session.data_source(data_source_uri)
+            annotation = self.session.create_annotation(data_source)
+            monitor.add(annotation.task, callback=finished.append)
+        tasks = monitor.tasks
+
+        percentages = monitor.wait_and_monitor()
+        assert next(percentages) == 0
+        assert next(percentages) == 0
+        assert monitor.pending == tasks
+
+        # Mannually run first task.
+        varda_annotations = varda.models.Annotation.query.order_by(
+            varda.models.Annotation.id).all()
+        result = varda.tasks.write_annotation.apply(
+            args=[varda_annotations[0].id])
+        varda_annotations[0].task_uuid = result.task_id
+        varda.db.session.commit()
+
+        assert monitor.wait_any() == tasks[:1]
+        assert finished == tasks[:1]
+        assert next(percentages) == 50
+
+        # Mannually run second task.
+        result = varda.tasks.write_annotation.apply(
+            args=[varda_annotations[1].id])
+        varda_annotations[1].task_uuid = result.task_id
+        varda.db.session.commit()
+
+        monitor.wait_all()
+        assert finished == tasks
+        assert all(task.success for task in tasks)
+
+    def test_annotation_task_monitor_async(self):
+        """
+        Poll annotation tasks from an asynchronous session worker.
+        """
+        admin = varda.models.User.query.filter_by(name='Administrator').one()
+        varda.db.session.add(varda.models.DataSource(
+            admin, 'test data source', 'vcf', local_file='test.vcf.gz',
+            gzipped=True))
+        varda.db.session.commit()
+
+        data_source_uri = self.uri_for_data_source(name='test data source')
+        data_source = self.session.data_source(data_source_uri)
+        annotation = self.session.create_annotation(data_source)
+
+        self.session.config.MAX_WORKERS = 1
+        async_session = AsyncSession(self.session)
+
+        monitor = TaskMonitor(self.session, [annotation.task])
+        assert async_session.submit(monitor.poll).result(timeout=30) == []
+        assert monitor.pending == [annotation.task]
+        async_session.close()
+
+    def test_annotation_task_poll_wait(self):
+        """
+        Create an annotation and check task polling times.
+        """
+        admin = varda.models.User.query.filter_by(name='Administrator').one()
+        varda.db.session.add(varda.models.DataSource(
+            admin, 'test data source', 'vcf', local_file='test.vcf.gz',
+            gzipped=True))
+        varda.db.session.commit()
+
+        data_source_uri = self.uri_for_data_source(name='test data source')
+        data_source = self.session.data_source(data_source_uri)
+
+        annotation = self.session.create_annotation(data_source)
+        task = annotation.task
+
+        assert task.history == []
+        assert task.poll_wait() == 0.01
+
+        # Back off exponentially while waiting.
+        for _ in range(3):
+            task.refresh()
+        assert [progress for _, progress in task.history] == [None] * 3
+        assert task.waiting
+        assert task.eta is None
+        assert task.poll_wait() == 0.04
+
+        # Simulate a running task at 10 percent per second.
+        now = time.time()
+        annotation._values[annotation._field_index['task']] = {
+            'state': 'running', 'progress': 40}
+        annotation._task_history.extend([(now - 2, 20), (now, 40)])
+        assert 5 < task.eta <= 6
+        assert 2.5 < task.poll_wait() <= 3
+
+        annotation._task_history.clear()
+        assert task.eta is None
+        assert task.poll_wait() == 0.01
+
+    def test_annotation_task_future(self):
+        """
+        Create an annotation and wait for its task using a future.
+        """
+        admin = varda.models.User.query.filter_by(name='Administrator').one()
+        varda.db.session.add(varda.models.DataSource(
+            admin, 'test data source', 'vcf', local_file='test.vcf.gz',
+            gzipped=True))
+        varda.db.session.commit()
+
+        data_source_uri = self.uri_for_data_source(name='test data source')
+        data_source = self.session.data_source(data_source_uri)
+
+        annotation = self.session.create_annotation(data_source)
+        task = annotation.task
+        poller = self.session.task_poller
+
+        future = task.as_future()
+        with pytest.raises(concurrent.futures.TimeoutError):
+            future.result(timeout=0.05)
+        assert poller.pending == [task]
+
+        # Cancelling stops polling.
+        assert future.cancel()
+        while poller._thread is not None:
+            time.sleep(0.01)
+        assert poller.pending == []
+
+        # Mannually run task.
+        varda_annotation = varda.models.Annotation.query.one()
+        result = varda.tasks.write_annotation.apply(args=[varda_annotation.id])
+        varda_annotation.task_uuid = result.task_id
+        varda.db.session.commit()
+
+        finished = []
+        future = task.as_future()
+        future.add_done_callback(finished.append)
+        assert future.result(timeout=5) is task
+        assert finished == [future]
+        assert task.success
+
+    def test_task_scheduler(self):
+        """
+        Limit the number of running tasks and start queued submissions by
+        priority.
+        """
+        class FakeTask(object):
+            def __init__(self):
+                self.future = concurrent.futures.Future()
+
+            def as_future(self):
+                return self.future
+
+        class FakeResource(object):
+            def __init__(self, name):
+                self.name = name
+                self.task = FakeTask()
+
+        started = []
+        lock = threading.Lock()
+
+        def create(name):
+            with lock:
+                started.append(name)
+            return FakeResource(name)
+
+        scheduler = TaskScheduler(self.session, max_running=2)
+        futures = [scheduler.submit(create, 'a'),
+                   scheduler.submit(create, 'b'),
+                   scheduler.submit(create, 'c'),
+                   scheduler.submit(create, 'd', priority=1),
+                   scheduler.submit(create, 'e')]
+        a, b = [future.result(timeout=5) for future in futures[:2]]
+        assert scheduler.running == 2
+        assert scheduler.queued == 3
+
+        # Cancelled submissions are never started.
+        assert futures[4].cancel()
+        assert scheduler.queued == 2
+
+        # Finished tasks release the next submission with highest priority.
+        a.task.future.set_result(a.task)
+        d = futures[3].result(timeout=5)
+        assert d.name == 'd'
+        assert not futures[2].done()
+        assert scheduler.queued == 1
+
+        b.task.future.set_result(b.task)
+        c = futures[2].result(timeout=5)
+        d.task.future.set_result(d.task)
+        c.task.future.set_result(c.task)
+        assert sorted(started[:2]) == ['a', 'b']
+        assert started[2:] == ['d', 'c']
+        assert scheduler.queued == 0
+        assert scheduler.running == 0
+
+    def test_task_scheduler_no_task(self):
+        """
+        Release the slot of a submission if its task cannot be waited for.
+        """
+        class FakeResource(object):
+            task = None
+
+        scheduler = TaskScheduler(self.session, max_running=1)
+        futures = [scheduler.submit(FakeResource) for _ in range(3)]
+        assert all(isinstance(future.result(timeout=5), FakeResource)
+                   for future in futures)
+        # The slot is released just after the future is resolved.
+        for _ in range(500):
+            if scheduler.running == 0:
+                break
+            time.sleep(0.01)
+        assert scheduler.running == 0
+        assert scheduler.queued == 0
+
+    def test_task_scheduler_close(self):
+        """
+        Cancel queued submissions when the session is closed.
+        """
+        class FakeTask(object):
+            def __init__(self):
+                self.future = concurrent.futures.Future()
+
+            def as_future(self):
+                return self.future
+
+        class FakeResource(object):
+            def __init__(self):
+                self.task = FakeTask()
+
+        scheduler = self.session.task_scheduler
+        scheduler.max_running = 1
+        futures = [scheduler.submit(FakeResource) for _ in range(3)]
+        resource = futures[0].result(timeout=5)
+
+        self.session.close()
+        assert all(future.cancelled() for future in futures[1:])
+        assert scheduler.queued == 0
+        with pytest.raises(RuntimeError):
+            scheduler.submit(FakeResource)
+
+        # Finishing the running task does not start anything.
+        resource.task.future.set_result(resource.task)
+        assert scheduler.running == 0
+        assert self.session.task_scheduler is not scheduler
+
     def test_create_annotation_task_resubmit(self):
         """
         Create an annotation and resubmit task.
@@ -600,3 +917,387 @@ class TestSession(utils.TestEnvironment):
         assert sample.name == 'Modified Sample'
         assert sample.pool_size == 42
         assert sample.dirty
+
+    def test_session_close(self):
+        """
+        Use the session after closing its connections.
+        """
+        admin_uri = self.uri_for_user(name='Administrator')
+        with self.session as session:
+            assert session.user(admin_uri).name == 'Administrator'
+        assert self.session.user(admin_uri).name == 'Administrator'
+
+    def test_get_user_cached(self):
+        """
+        Get the same user instance twice.
+        """
+        admin_uri = self.uri_for_user(name='Administrator')
+        user = self.session.user(admin_uri)
+        assert self.session.user(admin_uri) is user
+
+        self.session.invalidate(admin_uri)
+        assert self.session.user(admin_uri) is not user
+        assert self.session.user(admin_uri) == user
+
+    def test_sample_user_cached(self):
+        """
+        Get the same user instance from a sample twice.
+        """
+        admin = varda.models.User.query.filter_by(name='Administrator').one()
+        varda.db.session.add(varda.models.Sample(admin, 'Sample'))
+        varda.db.session.commit()
+
+        sample_uri = self.uri_for_sample(name='Sample')
+        sample = self.session.sample(sample_uri)
+
+        assert sample.user is sample.user
+        assert sample.user is self.session.user(sample.user.uri)
+
+    def test_sample_user_lazy(self):
+        """
+        Get a user from a sample without retrieving it.
+        """
+        admin = varda.models.User.query.filter_by(name='Administrator').one()
+        varda.db.session.add(varda.models.Sample(admin, 'Sample'))
+        varda.db.session.commit()
+
+        sample_uri = self.uri_for_sample(name='Sample')
+        sample = self.session.sample(sample_uri)
+
+        admin_uri = self.uri_for_user(name='Administrator')
+        assert not sample.user.loaded
+        assert sample.user.uri == admin_uri
+        assert not sample.user.loaded
+        assert sample.user.name == 'Administrator'
+        assert sample.user.loaded
+
+    def test_samples_embed_user(self):
+        """
+        Get sample collection with embedded users.
+        """
+        admin = varda.models.User.query.filter_by(name='Administrator').one()
+        varda.db.session.add(varda.models.Sample(admin, 'Sample'))
+        varda.db.session.commit()
+
+        requests_made = []
+        original_request = self.session._http.request
+        def request(method, uri, **kwargs):
+            requests_made.append((method, uri, kwargs.get('data')))
+            return original_request(method, uri, **kwargs)
+        self.session._http.request = request
+
+        samples = list(self.session.samples(embed=('user',)))
+        assert len(samples) == 1
+        assert samples[0].user.name == 'Administrator'
+
+        # One request with embedding, none for the user.
+        assert len(requests_made) == 1
+        method, uri, data = requests_made[0]
+        assert method == 'GET'
+        assert json.loads(data)['embed'] == ['user']
+
+    def test_samples_embed_unknown(self):
+        """
+        Embedding an unknown field is an error.
+        """
+        with pytest.raises(ValueError):
+            list(self.session.samples(embed=('owner',)))
+
+    def test_samples_embed_unsupported(self):
+        """
+        Fall back to a request without embedding only if the server rejects
+        embedding.
+        """
+        admin = varda.models.User.query.filter_by(name='Administrator').one()
+        varda.db.session.add(varda.models.Sample(admin, 'Sample'))
+        varda.db.session.commit()
+
+        message = []
+        requests_made = []
+        original_request = self.session._http.request
+        def request(method, uri, **kwargs):
+            embedding = 'embed' in (kwargs.get('data') or '')
+            requests_made.append(embedding)
+            if embedding:
+                response = requests.Response()
+                response.status_code = 400
+                response._content = json.dumps({'error': {
+                    'code': 'bad_request', 'message': message[0]}})
+                return response
+            return original_request(method, uri, **kwargs)
+        self.session._http.request = request
+
+        message.append('Invalid range')
+        with pytest.raises(BadRequestError):
+            list(self.session.samples(embed=('user',)))
+        assert requests_made == [True]
+
+        del requests_made[:]
+        message[0] = "{'embed': 'unknown field'}"
+        samples = list(self.session.samples(embed=('user',)))
+        assert samples[0].user.name == 'Administrator'
+        assert requests_made[:2] == [True, False]
+
+        # Embedding is not tried again.
+        del requests_made[:]
+        list(self.session.samples(embed=('user',)))
+        assert requests_made == [False]
+
+    def test_samples_prefetch_user(self):
+        """
+        Prefetch users for a sample collection.
+        """
+        admin = varda.models.User.query.filter_by(name='Administrator').one()
+        varda.db.session.add(varda.models.Sample(admin, 'Sample 1'))
+        varda.db.session.add(varda.models.Sample(admin, 'Sample 2'))
+        varda.db.session.commit()
+
+        samples = self.session.prefetch(self.session.samples(), 'user')
+        assert len(samples) == 2
+        assert all(sample.user.loaded for sample in samples)
+        assert samples[0].user is samples[1].user
+        assert samples[0].user.name == 'Administrator'
+
+    def test_samples_prefetch_not_link(self):
+        """
+        Prefetching a field that is not a link is an error.
+        """
+        admin = varda.models.User.query.filter_by(name='Administrator').one()
+        varda.db.session.add(varda.models.Sample(admin, 'Sample'))
+        varda.db.session.commit()
+
+        for field in ('name', 'pool_size', 'owner'):
+            with pytest.raises(ValueError):
+                self.session.prefetch(self.session.samples(), 'user', field)
+            with pytest.raises(ValueError):
+                self.session.samples().prefetch(field)
+
+    def test_samples_prefetch_user_async(self):
+        """
+        Prefetch users for a sample collection from an asynchronous session
+        worker.
+        """
+        admin = varda.models.User.query.filter_by(name='Administrator').one()
+        varda.db.session.add(varda.models.Sample(admin, 'Sample 1'))
+        varda.db.session.add(varda.models.Sample(admin, 'Sample 2'))
+        varda.db.session.commit()
+
+        self.session.config.MAX_WORKERS = 1
+        async_session = AsyncSession(self.session)
+
+        samples = async_session.submit(
+            self.session.prefetch, self.session.samples(), 'user').result(
+                timeout=30)
+        assert len(samples) == 2
+        assert all(sample.user.loaded for sample in samples)
+        async_session.close()
+
+    def test_session_codec(self):
+        """
+        Decode API responses with a custom JSON codec.
+        """
+        decoded = []
+        def loads(s):
+            decoded.append(s)
+            return json.loads(s)
+
+        session = Session(config=self.session.config,
+                          codec=Codec('test', json.dumps, loads))
+        admin_uri = self.uri_for_user(name='Administrator')
+        assert session.user(admin_uri).name == 'Administrator'
+        assert decoded
+
+    def test_get_codec(self):
+        """
+        Get JSON codecs by name.
+        """
+        assert get_codec('json').name == 'json'
+        assert get_codec('auto').name in ('ujson', 'simplejson', 'json')
+        with pytest.raises(ValueError):
+            get_codec('yaml')
+
+    def test_http_cache_not_modified(self):
+        """
+        Revalidate a cached response.
+        """
+        self.session.config.HTTP_CACHE = 'memory'
+        session = Session(config=self.session.config)
+
+        # The test server does not send validators, so we add them here.
+        not_modified = []
+        original_request = session._http.request
+        def request(method, uri, headers=None, **kwargs):
+            if headers.get('If-None-Match') == '"v1"':
+                not_modified.append(uri)
+                response = requests.Response()
+                response.status_code = 304
+                return response
+            response = original_request(method, uri, headers=headers,
+                                        **kwargs)
+            response.headers['ETag'] = '"v1"'
+            return response
+        session._http.request = request
+
+        admin_uri = self.uri_for_user(name='Administrator')
+        user = session.user(admin_uri)
+        assert not not_modified
+        user.refresh()
+        assert len(not_modified) == 1
+        assert user.name == 'Administrator'
+
+    def test_http_cache_conditional_server(self):
+        """
+        Revalidate cached responses with a server supporting conditional
+        requests.
+        """
+        # The test server does not send validators, so we wrap it in an
+        # application adding an `ETag` header and answering conditional
+        # requests.
+        statuses = []
+        app = self._varda.wsgi_app
+        def conditional_app(environ, start_response):
+            request = werkzeug.wrappers.Request(environ)
+            response = werkzeug.wrappers.Response.from_app(app, environ)
+            if request.method == 'GET' and response.status_code == 200:
+                response.add_etag()
+                response.make_conditional(request)
+            statuses.append(response.status_code)
+            return response(environ, start_response)
+        self._varda.wsgi_app = conditional_app
+
+        self.session.config.HTTP_CACHE = 'memory'
+        session = Session(config=self.session.config)
+
+        admin_uri = self.uri_for_user(name='Administrator')
+        user = session.user(admin_uri)
+        assert user.name == 'Administrator'
+        assert statuses[-1] == 200
+
+        user.refresh()
+        assert statuses[-1] == 304
+        assert user.name == 'Administrator'
+
+        admin = varda.models.User.query.filter_by(name='Administrator').one()
+        admin.name = 'Changed'
+        varda.db.session.commit()
+
+        user.refresh()
+        assert statuses[-1] == 200
+        assert user.name == 'Changed'
+
+    def test_get_coalesced(self):
+        """
+        Share a request in flight between concurrent identical requests.
+        """
+        admin_uri = self.uri_for_user(name='Administrator')
+
+        # Hold the first request until the other requests are waiting for it.
+        requests_made = []
+        original_request = self.session._http.request
+        def request(method, uri, **kwargs):
+            requests_made.append(uri)
+            timeout = time.time() + 5
+            while (self.session.coalesced_requests < 4 and
+                   time.time() < timeout):
+                time.sleep(0.01)
+            return original_request(method, uri, **kwargs)
+        self.session._http.request = request
+
+        responses = []
+        def get():
+            responses.append(self.session.get(admin_uri))
+        threads = [threading.Thread(target=get) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(requests_made) == 1
+        assert self.session.coalesced_requests == 4
+        assert len(responses) == 5
+        assert all(self.session.decode(response)['user']['name'] ==
+                   'Administrator' for response in responses)
+
+    def test_get_not_coalesced_after_write(self):
+        """
+        Do not share a request in flight that started before a write.
+        """
+        admin_uri = self.uri_for_user(name='Administrator')
+
+        # Hold the first request until we are done.
+        requests_made = []
+        release = threading.Event()
+        original_request = self.session._http.request
+        def request(method, uri, **kwargs):
+            requests_made.append(method)
+            if len(requests_made) == 1:
+                release.wait(5)
+            return original_request(method, uri, **kwargs)
+        self.session._http.request = request
+
+        thread = threading.Thread(target=self.session.get, args=(admin_uri,))
+        thread.start()
+        timeout = time.time() + 5
+        while not requests_made and time.time() < timeout:
+            time.sleep(0.01)
+
+        self.session.patch(admin_uri, data={'name': 'Administrator'})
+        response = self.session.get(admin_uri)
+        release.set()
+        thread.join()
+
+        assert requests_made == ['GET', 'PATCH', 'GET']
+        assert self.session.coalesced_requests == 0
+        assert self.session.decode(response)['user']['name'] == \
+            'Administrator'
+
+    def test_endpoints_lazy(self):
+        """
+        Get a resource without discovering the endpoints.
+        """
+        session = Session(config=self.session.config)
+
+        requests_made = []
+        original_request = session._http.request
+        def request(method, uri, **kwargs):
+            requests_made.append(uri)
+            return original_request(method, uri, **kwargs)
+        session._http.request = request
+
+        admin_uri = self.uri_for_user(name='Administrator')
+        assert session.user(admin_uri).name == 'Administrator'
+        assert requests_made == [admin_uri]
+
+    def test_endpoint_cache(self, tmpdir):
+        """
+        Reuse endpoints discovered by another session.
+        """
+        self.session.config.ENDPOINT_CACHE = str(tmpdir.join('endpoints'))
+        endpoints = Session(config=self.session.config).endpoints
+
+        session = Session(config=self.session.config)
+        requests_made = []
+        original_request = session._http.request
+        def request(method, uri, **kwargs):
+            requests_made.append(uri)
+            return original_request(method, uri, **kwargs)
+        session._http.request = request
+
+        assert session.endpoints == endpoints
+        assert not requests_made
+
+    def test_endpoint_cache_stale(self, tmpdir):
+        """
+        Discover the endpoints again if a cached endpoint is not found.
+        """
+        self.session.config.ENDPOINT_CACHE = str(tmpdir.join('endpoints'))
+        session = Session(config=self.session.config)
+        session.endpoints['sample_collection'] = '/moved/samples/'
+        session._endpoint_cache.set(
+            ' '.join([session.config.API_ROOT, ACCEPT_VERSION]),
+            session.endpoints)
+
+        session = Session(config=self.session.config)
+        sample = session.create_sample('Test sample')
+        assert sample.name == 'Test sample'
+        assert session.endpoints['sample_collection'] != '/moved/samples/'
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for :mod:`manwe.stream`.
+"""
+
+
+import json
+
+import pytest
+
+from manwe.stream import Reader, iter_array
+
+
+def chunked(data, size):
+    """
+    Split `data` into chunks of `size` bytes.
+    """
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def all_chunkings(data):
+    """
+    Split `data` into chunks of every possible size.
+    """
+    for size in range(1, len(data) + 1):
+        yield chunked(data, size)
+
+
+class TestReader(object):
+    def test_decode_values(self):
+        """
+        Decode consecutive values split at every possible chunk boundary.
+        """
+        values = [12.5, 1e5, -3, 0, 1.5e-3, 'a "quoted" \\ string\n',
+                  u'unicode ë ☃', True, False, None, [1, [2.25]],
+                  {'a': {'b': 1e2}}]
+        data = ' '.join(json.dumps(value) for value in values)
+        for chunks in all_chunkings(data):
+            reader = Reader(chunks)
+            assert [reader.decode() for _ in values] == values
+
+    def test_decode_utf8(self):
+        """
+        Decode strings with multibyte characters split between chunks.
+        """
+        data = u'"ë☃"'.encode('utf-8')
+        for chunks in all_chunkings(data):
+            assert Reader(chunks).decode() == u'ë☃'
+
+    def test_decode_number_end(self):
+        """
+        Decode a number at the end of the data.
+        """
+        for chunks in all_chunkings('12.5e3'):
+            assert Reader(chunks).decode() == 12.5e3
+
+    def test_decode_invalid(self):
+        """
+        Decoding invalid data raises ValueError.
+        """
+        with pytest.raises(ValueError):
+            Reader(['[1, 2']).decode()
+        with pytest.raises(ValueError):
+            Reader(['  ']).decode()
+
+
+class TestIterArray(object):
+    def test_iter_array(self):
+        """
+        Iterate over an array split at every possible chunk boundary.
+        """
+        items = [12.5, 1e5, 'escaped \\"\\u00eb\\"', True, None,
+                 {'uri': '/samples/1', 'tags': [1, 2]}]
+        data = json.dumps({'skipped': {'items': [1e5, {'a': '}'}]},
+                           'a': {'count': 3, 'items': items}})
+        for chunks in all_chunkings(data):
+            assert list(iter_array(chunks, ['a', 'items'])) == items
+
+    def test_iter_array_empty(self):
+        """
+        Iterate over an empty array.
+        """
+        for chunks in all_chunkings('{"a": {"items": [ ]}}'):
+            assert list(iter_array(chunks, ['a', 'items'])) == []
+
+    def test_iter_array_missing(self):
+        """
+        A missing key raises ValueError.
+        """
+        with pytest.raises(ValueError):
+            list(iter_array(['{"a": {"other": []}}'], ['a', 'items']))
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for :mod:`manwe.workflow`.
+"""
+
+
+import json
+
+import varda
+import varda.models
+import varda.tasks
+
+from manwe.workflow import Workflow
+
+import utils
+
+
+class TestWorkflow(utils.TestEnvironment):
+    def test_workflow_resume(self, tmpdir):
+        """
+        Resume a workflow with a finished annotation task and download the
+        annotated file.
+        """
+        admin = varda.models.User.query.filter_by(name='Administrator').one()
+        varda.db.session.add(varda.models.DataSource(
+            admin, 'test data source', 'vcf', local_file='test.vcf.gz',
+            gzipped=True))
+        varda.db.session.commit()
+
+        data_source_uri = self.uri_for_data_source(name='test data source')
+        data_source = self.session.data_source(data_source_uri)
+        annotation = self.session.create_annotation(data_source)
+
+        # Mannually run task.
+        varda_annotation = varda.models.Annotation.query.one()
+        result = varda.tasks.write_annotation.apply(args=[varda_annotation.id])
+        varda_annotation.task_uuid = result.task_id
+        varda.db.session.commit()
+
+        # State of a workflow interrupted while waiting for the annotation.
+        output = str(tmpdir.join('test.annotated.vcf.gz'))
+        state_file = str(tmpdir.join('state.json'))
+        with open(state_file, 'w') as handle:
+            json.dump({'jobs': [{
+                'vcf_file': 'test.vcf.gz',
+                'options': {'sample': None,
+                            'output': output,
+                            'queries': {},
+                            'data_uploaded': False,
+                            'prefer_genotype_likelihoods': False},
+                'stages': {'upload': {'uri': data_source_uri,
+                                      'finished': True},
+                           'annotation': {'uri': annotation.uri}}}]},
+                      handle)
+
+        # Other options do not resume the saved job.
+        workflow = Workflow(self.session, state_file=state_file,
+                            queries={'a': '*'})
+        assert workflow.add('test.vcf.gz', output=output).stage == 'upload'
+
+        workflow = Workflow(self.session, state_file=state_file)
+        job = workflow.add('test.vcf.gz', output=output)
+        assert job.stage == 'annotation'
+
+        assert workflow.run() == []
+        assert job.finished
+        assert job.get('download', 'path') == output
+
+        annotated = annotation.annotated_data_source
+        with open(output, 'rb') as handle:
+            assert handle.read() == ''.join(annotated.data)
+
+        with open(state_file) as handle:
+            stages = json.load(handle)['jobs'][0]['stages']
+        assert all(stages[stage]['finished']
+                   for stage in ('upload', 'annotation', 'download'))
+
+        # Nothing left to do.
+        workflow = Workflow(self.session, state_file=state_file)
+        assert workflow.add('test.vcf.gz', output=output).finished
+        assert workflow.run() == []